@@ -1,35 +1,77 @@
 import os
 import time
+import hashlib
+import hmac
 import json
 import logging
-import boto3
 import re
+import threading
 import base64
+import random
 import uuid
+import subprocess
+import tempfile
+from collections import OrderedDict
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import wraps
+from urllib.parse import quote, urlsplit
 from typing import Dict, Any, Optional
 from botocore.exceptions import ClientError
 
 import requests
+from requests.adapters import HTTPAdapter
 from flask import Flask, jsonify, request, g
 from flask_cors import CORS
-from jose import jwt, JWTError
+from jose import jwk, jwt, JWTError
+from jose.exceptions import JWKError
+
+import metrics
+from migrate_phrases import move_user
 
 S3_BUCKET = os.getenv("S3_BUCKET", "quicksign-media")
 
 USERS_BUCKET = "quicksign-media-users"
-session = boto3.Session(profile_name="quicksigndev", region_name="eu-north-1")
-dynamodb = session.resource("dynamodb")
-table = dynamodb.Table("quicksign_no")
-table2=dynamodb.Table("Support")
+AWS_PROFILE = os.getenv("AWS_PROFILE", "quicksigndev")
+AWS_REGION = os.getenv("AWS_REGION", "eu-north-1")
+# boto3 session, DynamoDB tables and the S3 client are created by startup()
+session = dynamodb = table = table2 = phrases_table = s3 = None
+PHRASES_TABLE = os.getenv("PHRASES_TABLE", "quicksign_phrases")
+PHRASES_PAGE_SIZE = int(os.getenv("PHRASES_PAGE_SIZE", "50"))  # with ?limit= or ?cursor=
+PHRASES_MAX_PAGE = 200
+PHRASES_MOVE_LEGACY = os.getenv("PHRASES_MOVE_LEGACY", "1") == "1"  # 0 once migrate_phrases.py moved everyone
 
 
 S3_KEY_PATTERNS = [
     "videos/ar/{token}.mp4",            
 ]
 PRESIGN_EXPIRES = int(os.getenv("PRESIGN_EXPIRES", "3600"))
-
-s3 = session.client("s3")
+PRESIGN_CACHE_SIZE = int(os.getenv("PRESIGN_CACHE_SIZE", "4096"))  # 0 disables the cache
+PRESIGN_REUSE = float(os.getenv("PRESIGN_REUSE", "0.5"))  # share of PRESIGN_EXPIRES a URL is handed out for
+PRESIGN_LOCAL = os.getenv("PRESIGN_LOCAL", "1") == "1"
+COMPOSE_PREFIX = os.getenv("COMPOSE_PREFIX", "composites/")  # keep it outside the catalog's prefixes
+COMPOSE_CACHE_SIZE = int(os.getenv("COMPOSE_CACHE_SIZE", "4096"))  # composite keys known to exist
+COMPOSE_TIMEOUT = int(os.getenv("COMPOSE_TIMEOUT", "120"))
+COMPOSE_DOWNLOADS = int(os.getenv("COMPOSE_DOWNLOADS", "8"))  # parallel clip downloads
+FFMPEG = os.getenv("FFMPEG", "ffmpeg")
+
+ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:6000")
+# comma-separated ML replicas; requests go to the one with the fewest in flight
+ML_SERVICE_URLS = [u.strip().rstrip("/") for u in os.getenv("ML_SERVICE_URLS", ML_SERVICE_URL).split(",") if u.strip()]
+ML_HEALTH_SECONDS = float(os.getenv("ML_HEALTH_SECONDS", "5"))
+ML_EJECT_FAILURES = int(os.getenv("ML_EJECT_FAILURES", "3"))  # consecutive failures that eject a replica
+ML_EJECT_SECONDS = float(os.getenv("ML_EJECT_SECONDS", "30"))
+ML_HEDGE = os.getenv("ML_HEDGE", "0") == "1"  # second request to another replica after the p95 latency
+ML_HEDGE_MIN_DELAY = float(os.getenv("ML_HEDGE_MIN_DELAY", "0.05"))
+ML_HEDGE_DEFAULT_DELAY = float(os.getenv("ML_HEDGE_DEFAULT_DELAY", "2"))  # until there are enough samples
+STREAM_CHUNK = 64 * 1024
+ML_POOL_SIZE = int(os.getenv("ML_POOL_SIZE", "16"))  # keep-alive connections to the ML service
+ML_CONNECT_TIMEOUT = float(os.getenv("ML_CONNECT_TIMEOUT", "3"))
+ML_READ_TIMEOUT = float(os.getenv("ML_READ_TIMEOUT", "120"))
+ML_JOB_WORKERS = int(os.getenv("ML_JOB_WORKERS", "4"))  # async /signtoarabic jobs sent to the ML service at once
+ML_MAX_PENDING_JOBS = int(os.getenv("ML_MAX_PENDING_JOBS", "64"))
+ML_JOB_TTL_SECONDS = int(os.getenv("ML_JOB_TTL_SECONDS", "600"))  # finished jobs kept for polling
+ML_JOB_MAX_WAIT = float(os.getenv("ML_JOB_MAX_WAIT", "25"))  # longest long-poll
 
 
 COGNITO_REGION='eu-north-1'
@@ -38,6 +80,9 @@ COGNITO_APP_CLIENT_ID='4d9aeahendp2o0i4o06k7tgo7n'
 
 CORS_ORIGINS= os.getenv("CORS_ORIGINS", "*")
 JWKS_CACHE_SECONDS   = int(os.getenv("JWKS_CACHE_SECONDS", "43200"))  # 12h
+JWKS_MIN_REFRESH_SECONDS = int(os.getenv("JWKS_MIN_REFRESH_SECONDS", "60"))  # between refetches for unknown kids
+JWKS_NEGATIVE_SECONDS = int(os.getenv("JWKS_NEGATIVE_SECONDS", "300"))  # an unknown kid is rejected without a refetch
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))  # verified tokens; 0 disables the cache
 
 ISSUER = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}"
 JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
@@ -46,37 +91,153 @@ JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  
 if CORS_ORIGINS == "*":
-    CORS(app, supports_credentials=False, expose_headers=["Content-Type", "Authorization"])
+    CORS(app, supports_credentials=False, expose_headers=["Content-Type", "Authorization", "X-Next-Cursor"])
 else:
     origins = [o.strip() for o in CORS_ORIGINS.split(",") if o.strip()]
-    CORS(app, origins=origins, supports_credentials=False, expose_headers=["Content-Type", "Authorization"])
+    CORS(app, origins=origins, supports_credentials=False, expose_headers=["Content-Type", "Authorization", "X-Next-Cursor"])
 
 logging.basicConfig(level=logging.INFO)
 log = app.logger
+metrics.instrument(app, log=log.warning)
 
-# JWKS cache
+# JWKS cache: keys are parsed into jose key objects once per fetch. Fetching happens
+# at startup and then on a background thread; a request only waits for it when its
+# kid is unknown, at most once per JWKS_MIN_REFRESH_SECONDS, and kids that a fetch
+# made for them still lacks are rejected without refetching for JWKS_NEGATIVE_SECONDS.
 
-_jwks_cache: Dict[str, Any] = {"fetched_at": 0, "keys": []}
+_jwks_cache: Dict[str, Any] = {"fetched_at": 0.0, "attempted_at": 0.0, "keys": [], "by_kid": {}}
+_jwks_lock = threading.Lock()
+_unknown_kids: Dict[str, float] = {}  # kid -> rejected until
 
 def _refresh_jwks(force: bool = False) -> None:
-    now = int(time.time())
-    if force or now - _jwks_cache["fetched_at"] > JWKS_CACHE_SECONDS or not _jwks_cache["keys"]:
+    requested_at = time.time()
+    if not (force or requested_at - _jwks_cache["fetched_at"] > JWKS_CACHE_SECONDS or not _jwks_cache["keys"]):
+        return
+    with _jwks_lock:  # single flight: callers queued behind a fetch use its result
+        if _jwks_cache["fetched_at"] >= requested_at:
+            return
+        _jwks_cache["attempted_at"] = time.time()
         resp = requests.get(JWKS_URL, timeout=15)
         resp.raise_for_status()
-        data = resp.json()
-        _jwks_cache["keys"] = data.get("keys", [])
-        _jwks_cache["fetched_at"] = now
-        log.info("JWKS refreshed: %d keys", len(_jwks_cache["keys"]))
-
-def _get_key_for_kid(kid: str) -> Optional[Dict[str, Any]]:
-    for k in _jwks_cache.get("keys", []):
-        if k.get("kid") == kid:
-            return k
-    _refresh_jwks(force=True)
-    for k in _jwks_cache.get("keys", []):
-        if k.get("kid") == kid:
-            return k
-    return None
+        keys = resp.json().get("keys", [])
+        by_kid = {}
+        for k in keys:
+            alg = k.get("alg", "RS256")
+            try:
+                by_kid[k["kid"]] = (jwk.construct(k, alg), alg)
+            except (KeyError, JWKError) as e:
+                log.warning("JWKS: skipping key %s (%s)", k.get("kid"), e)
+        _jwks_cache["keys"] = keys
+        _jwks_cache["by_kid"] = by_kid
+        _jwks_cache["fetched_at"] = time.time()
+        _unknown_kids.clear()
+        log.info("JWKS refreshed: %d keys", len(keys))
+
+def _refresh_jwks_forever() -> None:
+    while True:
+        time.sleep(max(_jwks_cache["fetched_at"] + JWKS_CACHE_SECONDS - time.time(), JWKS_MIN_REFRESH_SECONDS))
+        try:
+            _refresh_jwks(force=True)
+        except Exception as e:
+            log.warning("JWKS: background refresh failed (%s), keeping %d keys", e, len(_jwks_cache["keys"]))
+
+def _get_key_for_kid(kid: str) -> Optional[tuple[Any, str]]:
+    """(key object, alg) for kid, or None."""
+    key = _jwks_cache["by_kid"].get(kid)
+    if key is not None:
+        return key
+    now = time.time()
+    if _unknown_kids.get(kid, 0.0) > now:
+        return None
+    if now - _jwks_cache["attempted_at"] >= JWKS_MIN_REFRESH_SECONDS:
+        try:
+            _refresh_jwks(force=True)
+        except requests.RequestException as e:
+            log.warning("JWKS: refresh for kid %s failed (%s)", kid, e)
+    key = _jwks_cache["by_kid"].get(kid)
+    # only a fetch that finished after this lookup began tells us the kid is not
+    # published; a rate-limited or failed refetch leaves it to the next request
+    if key is None and _jwks_cache["fetched_at"] >= now:
+        if len(_unknown_kids) >= 1024:  # a flood of made-up kids
+            _unknown_kids.clear()
+        _unknown_kids[kid] = now + JWKS_NEGATIVE_SECONDS
+    return key
+
+# Startup: AWS clients and JWKS load concurrently; requests other than /health and
+# /ready get 503 until both are done, so no user request pays for them.
+
+_startup: Dict[str, Any] = {"ready": False, "phases": {}, "error": None}
+
+def _aws_call_started(context: Dict[str, Any], **kwargs) -> None:
+    context["metrics_t0"] = time.perf_counter()
+
+def _aws_call_finished(model, context: Dict[str, Any], **kwargs) -> None:
+    # every S3 / DynamoDB API call becomes a stage, e.g. "s3.HeadObject", "dynamodb.GetItem"
+    t0 = context.get("metrics_t0")
+    if t0 is not None:
+        metrics.observe_stage(f"{model.service_model.service_name}.{model.name}", time.perf_counter() - t0)
+
+def _connect_aws() -> None:
+    global session, dynamodb, table, table2, phrases_table, s3
+    import boto3  # deferred: boto3 import and service model loading are most of the cold start
+    session = boto3.Session(profile_name=AWS_PROFILE, region_name=AWS_REGION)
+    session.events.register("before-call", _aws_call_started)
+    session.events.register("after-call", _aws_call_finished)
+    dynamodb = session.resource("dynamodb")
+    table = dynamodb.Table("quicksign_no")
+    table2 = dynamodb.Table("Support")
+    phrases_table = dynamodb.Table(PHRASES_TABLE)
+    s3 = session.client("s3")
+    session.get_credentials()  # resolve the credential chain now, not on the first call
+
+def _startup_phase(name: str, fn) -> None:
+    delay = 1.0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            _startup["error"] = f"{name}: {e}"
+            log.warning("startup: %s failed (%s), retrying in %.0f s", name, e, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+            continue
+        _startup["phases"][name] = round((time.perf_counter() - t0) * 1000.0, 1)
+        log.info("startup: %s %.0f ms", name, _startup["phases"][name])
+        return
+
+def startup() -> None:
+    def aws_and_catalog():
+        _startup_phase("aws", _connect_aws)
+        if CATALOG_REFRESH_SECONDS > 0:
+            _startup_phase("catalog", catalog.refresh)
+
+    t0 = time.perf_counter()
+    # daemon threads: phases retry until they succeed and must not block interpreter exit
+    jobs = [threading.Thread(target=aws_and_catalog, name="startup-aws", daemon=True),
+            threading.Thread(target=_startup_phase, args=("jwks", lambda: _refresh_jwks(force=True)),
+                             name="startup-jwks", daemon=True)]
+    for job in jobs:
+        job.start()
+    for job in jobs:
+        job.join()
+    _startup["phases"]["total"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    _startup["error"] = None
+    _startup["ready"] = True
+    log.info("startup: ready in %.0f ms", _startup["phases"]["total"])
+    threading.Thread(target=_refresh_jwks_forever, name="jwks", daemon=True).start()
+    threading.Thread(target=_check_ml_forever, name="ml-health", daemon=True).start()
+    if CATALOG_REFRESH_SECONDS > 0:
+        threading.Thread(target=_refresh_catalog_forever, name="catalog", daemon=True).start()
+
+@app.before_request
+def _until_ready():
+    if _startup["ready"] or request.method == "OPTIONS" or request.endpoint in ("health", "ready", "metrics"):
+        return None
+    resp = jsonify({"error": "Service is starting", "status": 503})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "1"
+    return resp
 
 from functools import lru_cache
 
@@ -98,6 +259,182 @@ CHAR_FOLD = {
 }
 
 MAX_RETURNED_CLIPS = int(os.getenv("MAX_RETURNED_CLIPS", "200"))
+MAX_BATCH_TEXTS = int(os.getenv("MAX_BATCH_TEXTS", "100"))
+TEXT_CACHE_SIZE = int(os.getenv("TEXT_CACHE_SIZE", "2048"))  # normalized texts; 0 disables the cache
+TEXT_CACHE_SECONDS = float(os.getenv("TEXT_CACHE_SECONDS", "600"))
+# 0 disables the catalog index and resolves tokens with head_object probes
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+
+# Sign catalog: token -> key maps built from a listing of the video prefixes, so
+# resolving a sentence makes no S3 calls. Rebuilt in the background and swapped in
+# whole; requests always see one complete listing.
+
+def _pattern_regex(pattern: str) -> "re.Pattern[str]":
+    prefix, suffix = pattern.split("{token}")
+    return re.compile(re.escape(prefix) + r"([^/]+)" + re.escape(suffix))
+
+def _list_prefixes(patterns: list[str]) -> list[str]:
+    prefixes = {p.split("{token}")[0] for p in patterns}
+    return sorted(p for p in prefixes if not any(p != q and p.startswith(q) for q in prefixes))
+
+def _phrase_trie(words: Dict[str, str]) -> Dict[Any, Any]:
+    # nested dicts keyed by whole words; None holds the (token, key) of a phrase ending there
+    root: Dict[Any, Any] = {}
+    for token, key in words.items():
+        parts = normalize_ar(token).split()
+        if not parts:
+            continue
+        node = root
+        for part in parts:
+            node = node.setdefault(part, {})
+        node.setdefault(None, (token, key))
+    return root
+
+_FOLD_TABLE = str.maketrans(CHAR_FOLD)
+
+class SignTokenizer:
+    """Greedy longest-match segmentation of normalized text into catalog clips.
+
+    Whole words and multi-word phrases come from a trie over the words of the
+    normalized clip names. Words left over are fingerspelled with the longest
+    folded letter clip at each position, after an initial "ال". Same output as
+    the per-word _expand_word_to_tokens for single-word clips.
+    """
+
+    def __init__(self, words: Dict[str, str], letters: Dict[str, str]):
+        self.phrases = _phrase_trie(words)
+        self.al = ("ال", letters["ال"]) if "ال" in letters else None
+        self.letters = {t: (t, k) for t, k in letters.items() if t != "ال"}
+        self.letter_len = max(map(len, self.letters), default=1)
+        self.letter_starts = {t[0] for t in self.letters if len(t) > 1}  # where a longer match is possible
+
+    def spell(self, word: str) -> list[tuple[str, str]]:
+        out: list[tuple[str, str]] = []
+        i = 0
+        if self.al and word.startswith("ال"):
+            out.append(self.al)
+            i = 2
+        folded = word.translate(_FOLD_TABLE)
+        letters, starts, n = self.letters, self.letter_starts, len(folded)
+        while i < n:
+            ch = folded[i]
+            size = 1
+            if ch in starts:
+                for size in range(min(self.letter_len, n - i), 0, -1):
+                    if folded[i:i + size] in letters:
+                        break
+            pair = letters.get(folded[i:i + size])
+            if pair:
+                out.append(pair)
+            i += size
+        return out
+
+    def segment(self, text: str) -> list[tuple[str, str]]:
+        out: list[tuple[str, str]] = []
+        words = text.split()
+        phrases, i, n = self.phrases, 0, len(words)
+        while i < n:
+            node = phrases.get(words[i])
+            if node is None:
+                out.extend(self.spell(words[i]))
+                i += 1
+                continue
+            best, j = node.get(None), i + 1
+            end = j
+            while j < n:
+                node = node.get(words[j])
+                if node is None:
+                    break
+                j += 1
+                if None in node:
+                    best, end = node[None], j
+            if best:
+                out.append(best)
+                i = end
+            else:  # only the start of longer phrases
+                out.extend(self.spell(words[i]))
+                i += 1
+        return out
+
+class SignCatalog:
+    def __init__(self, bucket: str, word_patterns: list[str], letter_patterns: list[str]):
+        self.bucket = bucket
+        self.word_patterns = [_pattern_regex(p) for p in word_patterns]
+        self.letter_patterns = [_pattern_regex(p) for p in letter_patterns]
+        self.prefixes = _list_prefixes(word_patterns + letter_patterns)
+        self._etags: Dict[str, str] = {}
+        self._maps: Optional[tuple[Dict[str, str], Dict[str, str], SignTokenizer]] = None  # (words, letters, tokenizer)
+        self.loaded_at = 0.0
+        self.generation = 0  # bumped whenever the maps change
+
+    @property
+    def loaded(self) -> bool:
+        return self._maps is not None
+
+    def word(self, token: str) -> Optional[str]:
+        return self._maps[0].get(token)
+
+    def letter(self, token: str) -> Optional[str]:
+        return self._maps[1].get(token)
+
+    def etag(self, key: str) -> str:
+        return self._etags.get(key, "")
+
+    def segment(self, text: str) -> list[tuple[str, str]]:
+        return self._maps[2].segment(text)
+
+    def _list(self) -> Dict[str, str]:
+        etags: Dict[str, str] = {}
+        paginator = s3.get_paginator("list_objects_v2")
+        for prefix in self.prefixes:
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+                for obj in page.get("Contents", []):
+                    etags[obj["Key"]] = obj["ETag"]
+        return etags
+
+    @staticmethod
+    def _index(keys, patterns) -> Dict[str, str]:
+        # earlier patterns win, like the probing order of _first_existing_key
+        index: Dict[str, str] = {}
+        for rx in patterns:
+            for key in keys:
+                m = rx.fullmatch(key)
+                if m:
+                    index.setdefault(m.group(1), key)
+        return index
+
+    def refresh(self) -> None:
+        etags = self._list()
+        if self._maps is not None and etags == self._etags:
+            self.loaded_at = time.time()
+            return
+        added = etags.keys() - self._etags.keys()
+        removed = self._etags.keys() - etags.keys()
+        changed = sum(1 for k in etags.keys() & self._etags.keys() if etags[k] != self._etags[k])
+        keys = sorted(etags)
+        words, letters = self._index(keys, self.word_patterns), self._index(keys, self.letter_patterns)
+        self._maps = (words, letters, SignTokenizer(words, letters))
+        self._etags = etags
+        self.generation += 1
+        self.loaded_at = time.time()
+        log.info("catalog: %d words, %d letters (+%d -%d ~%d objects)",
+                 len(self._maps[0]), len(self._maps[1]), len(added), len(removed), changed)
+
+    def status(self) -> Dict[str, Any]:
+        if not self.loaded:
+            return {"loaded": False}
+        return {"loaded": True, "objects": len(self._etags), "words": len(self._maps[0]),
+                "letters": len(self._maps[1]), "age_s": round(time.time() - self.loaded_at, 1)}
+
+catalog = SignCatalog(S3_BUCKET, S3_KEY_PATTERNS, S3_LETTER_PATTERNS)
+
+def _refresh_catalog_forever() -> None:
+    while True:
+        time.sleep(CATALOG_REFRESH_SECONDS)
+        try:
+            catalog.refresh()
+        except Exception as e:
+            log.warning("catalog: refresh failed (%s), keeping the current index", e)
 
 @lru_cache(maxsize=8192)
 def _cached_exists(key: str) -> bool:
@@ -117,11 +454,21 @@ def _first_existing_key(patterns: list[str], token: str) -> Optional[str]:
             return key
     return None
 
+def _word_key(token: str) -> Optional[str]:
+    if catalog.loaded:
+        return catalog.word(token)
+    return _first_existing_key(S3_KEY_PATTERNS, token)
+
+def _letter_key(token: str) -> Optional[str]:
+    if catalog.loaded:
+        return catalog.letter(token)
+    return _first_existing_key(S3_LETTER_PATTERNS, token)
+
 def _fold_char(ch: str) -> str:
     return CHAR_FOLD.get(ch, ch)
 
 def _expand_word_to_tokens(word: str) -> list[tuple[str, str]]:
-    wk = _first_existing_key(S3_KEY_PATTERNS, word)
+    wk = _word_key(word)
     if wk:
         return [(word, wk)]
 
@@ -129,7 +476,7 @@ def _expand_word_to_tokens(word: str) -> list[tuple[str, str]]:
     i, n = 0, len(word)
 
     if word.startswith("ال"):
-        al_key = _first_existing_key(S3_LETTER_PATTERNS, "ال")
+        al_key = _letter_key("ال")
         if al_key:
             out.append(("ال", al_key))
             i = 2 
@@ -137,14 +484,14 @@ def _expand_word_to_tokens(word: str) -> list[tuple[str, str]]:
     while i < n:
         ch = word[i]
         if ch == "ل" and i + 1 < n and word[i + 1] in ALEF_VARIANTS:
-            la_key = _first_existing_key(S3_LETTER_PATTERNS, "لا")
+            la_key = _letter_key("لا")
             if la_key:
                 out.append(("لا", la_key))
             else:
-                l_key = _first_existing_key(S3_LETTER_PATTERNS, "ل")
+                l_key = _letter_key("ل")
                 if l_key:
                     out.append(("ل", l_key))
-                a_key = _first_existing_key(S3_LETTER_PATTERNS, "ا")
+                a_key = _letter_key("ا")
                 if a_key:
                     out.append(("ا", a_key))
             i += 2
@@ -152,17 +499,69 @@ def _expand_word_to_tokens(word: str) -> list[tuple[str, str]]:
 
         ch = _fold_char(ch)
         if ch == "ء":
-            hk = _first_existing_key(S3_LETTER_PATTERNS, "ء")
+            hk = _letter_key("ء")
             if hk:
                 out.append(("ء", hk))
             i += 1
             continue
-        lk = _first_existing_key(S3_LETTER_PATTERNS, ch)
+        lk = _letter_key(ch)
         if lk:
             out.append((ch, lk))
         i += 1
     return out
 
+def _tokenize(norm: str) -> list[tuple[str, str]]:
+    if catalog.loaded:
+        return catalog.segment(norm)
+    # no catalog: word by word, probing S3
+    return [pair for w in norm.split() for pair in _expand_word_to_tokens(w)]
+
+class TextCache:
+    """Normalized text -> resolved (token, key) list, for TEXT_CACHE_SECONDS and
+    only as long as the catalog generation it was resolved against is current."""
+
+    def __init__(self, size: int, seconds: float):
+        self.size = size
+        self.seconds = seconds
+        self._entries: "OrderedDict[str, tuple[list[tuple[str, str]], int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, norm: str) -> Optional[list[tuple[str, str]]]:
+        with self._lock:
+            entry = self._entries.get(norm)
+            if entry and entry[1] == catalog.generation and time.time() - entry[2] < self.seconds:
+                self._entries.move_to_end(norm)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, norm: str, pairs: list[tuple[str, str]], generation: int) -> None:
+        with self._lock:
+            self._entries[norm] = (pairs, generation, time.time())
+            self._entries.move_to_end(norm)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def status(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "size": self.size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None}
+
+text_cache = TextCache(TEXT_CACHE_SIZE, TEXT_CACHE_SECONDS)
+
+def _resolve(norm: str) -> list[tuple[str, str]]:
+    """The clips for normalized text, capped at MAX_RETURNED_CLIPS."""
+    if TEXT_CACHE_SIZE <= 0:
+        return _tokenize(norm)[:MAX_RETURNED_CLIPS]
+    pairs = text_cache.get(norm)
+    if pairs is None:
+        generation = catalog.generation  # read first: a swap during _tokenize must not be cached as current
+        pairs = _tokenize(norm)[:MAX_RETURNED_CLIPS]
+        text_cache.put(norm, pairs, generation)
+    return pairs
+
 class AuthError(Exception):
     def __init__(self, message: str, status: int = 401):
         super().__init__(message)
@@ -174,7 +573,48 @@ def _extract_bearer(auth_header: str) -> str:
         raise AuthError("Missing or invalid Authorization header", 401)
     return auth_header.split(" ", 1)[1].strip()
 
+class ClaimsCache:
+    """Verified claims by token hash, dropped once the token's exp has passed."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, digest: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            claims = self._entries.get(digest)
+            if claims is not None and claims["exp"] > time.time():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return claims
+            if claims is not None:
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def put(self, digest: bytes, claims: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[digest] = claims
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def status(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "size": self.size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None}
+
+claims_cache = ClaimsCache(JWT_CACHE_SIZE)
+
 def verify_id_token(token: str) -> Dict[str, Any]:
+    digest = hashlib.sha256(token.encode()).digest()
+    if JWT_CACHE_SIZE > 0:
+        claims = claims_cache.get(digest)
+        if claims is not None:
+            return claims
+
     try:
         unverified = jwt.get_unverified_header(token)
     except JWTError:
@@ -184,16 +624,16 @@ def verify_id_token(token: str) -> Dict[str, Any]:
     if not kid:
         raise AuthError("Missing kid in token header", 401)
 
-    _refresh_jwks() 
-    key = _get_key_for_kid(kid)
-    if not key:
+    found = _get_key_for_kid(kid)
+    if not found:
         raise AuthError("Unable to find signing key", 401)
+    key, alg = found
 
     try:
         claims = jwt.decode(
             token,
             key,
-            algorithms=[key.get("alg", "RS256")],
+            algorithms=[alg],
             audience=COGNITO_APP_CLIENT_ID,
             issuer=ISSUER,
             options={
@@ -208,6 +648,8 @@ def verify_id_token(token: str) -> Dict[str, Any]:
     if claims.get("token_use") != "id":
         raise AuthError("Wrong token_use (expected 'id'). Send the ID token.", 401)
 
+    if JWT_CACHE_SIZE > 0 and isinstance(claims.get("exp"), (int, float)):
+        claims_cache.put(digest, claims)
     return claims
 
 def require_jwt(f):
@@ -215,7 +657,8 @@ def require_jwt(f):
     def wrapper(*args, **kwargs):
         auth_header = request.headers.get("Authorization", "")
         token = _extract_bearer(auth_header)
-        claims = verify_id_token(token)
+        with metrics.stage("jwt_verify"):
+            claims = verify_id_token(token)
         g.jwt_claims = claims
         return f(*args, **kwargs)
     return wrapper
@@ -239,6 +682,14 @@ def health():
     return jsonify({"status": "ok", "issuer": ISSUER}), 200
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    return (jsonify({**_startup, "catalog": catalog.status(), "presign_cache": presign_cache.status(),
+                     "text_cache": text_cache.status(), "compositor": compositor.status(),
+                     "jwt_cache": claims_cache.status(), "ml_jobs": prediction_jobs.status(),
+                     "ml": ml_replicas.status()}),
+            200 if _startup["ready"] else 503)
+
 @app.route("/me", methods=["GET"])
 @require_jwt
 def me():
@@ -247,26 +698,125 @@ def me():
     return jsonify(profile), 200
 
 
+# Saved and emergency phrases: one item per entry in PHRASES_TABLE, partition key
+# "users" (the Cognito sub) and sort key "sk" = "<kind>#<id>". Ids start with the
+# creation time in ms, so a reverse Query lists newest first. A list request with
+# ?limit= or ?cursor= gets one page (PHRASES_PAGE_SIZE by default) and the cursor
+# of the next in the X-Next-Cursor header; without either, all entries. Adding is
+# one put, deleting one delete by key. A user's old lists in quicksign_no are
+# moved over on their first phrases request (migrate_phrases.move_user), once per
+# process; migrate_phrases.py moves everyone else.
+
+_PHRASE_ID = re.compile(r"^[0-9]{13}-[0-9A-Za-z-]{1,36}$")
+
+def _new_phrase_id(created: float) -> str:
+    return f"{int(created * 1000):013d}-{uuid.uuid4().hex[:12]}"
+
+def _encode_cursor(key: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _decode_cursor(cursor: str, sub: str, kind: str) -> Dict[str, Any]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict) or key.get("users") != sub or not str(key.get("sk", "")).startswith(f"{kind}#"):
+        raise ValueError("Invalid cursor")
+    return {"users": sub, "sk": key["sk"]}
+
+_moved_users: "OrderedDict[str, None]" = OrderedDict()
+_moved_lock = threading.Lock()
+
+def _move_legacy_phrases(sub: str) -> None:
+    if not PHRASES_MOVE_LEGACY:
+        return
+    with _moved_lock:
+        if sub in _moved_users:
+            return
+    try:
+        moved = move_user(table, phrases_table, sub)
+    except ClientError as e:
+        log.error("Moving legacy phrases of %s failed (%s); retrying on the next request", sub, e)
+        return
+    if moved:
+        log.info("Moved %d legacy phrases of %s into %s", moved, sub, PHRASES_TABLE)
+    with _moved_lock:
+        _moved_users[sub] = None
+        while len(_moved_users) > 100_000:
+            _moved_users.popitem(last=False)
+
+def _phrase_record(entry: Dict[str, Any]) -> Dict[str, Any]:
+    rec = {
+        "id": entry["sk"].split("#", 1)[1],
+        "text": entry.get("text", ""),
+        "created": entry.get("created"),
+    }
+    if entry.get("image_key"):
+        rec["image_url"] = _presign(USERS_BUCKET, entry["image_key"])
+    return rec
+
+def _list_phrases(sub: str, kind: str):
+    from boto3.dynamodb.conditions import Key
+    query = {
+        "KeyConditionExpression": Key("users").eq(sub) & Key("sk").begins_with(f"{kind}#"),
+        "ScanIndexForward": False,
+    }
+    cursor = request.args.get("cursor")
+    paged = cursor is not None or "limit" in request.args
+    if paged:
+        query["Limit"] = min(max(request.args.get("limit", PHRASES_PAGE_SIZE, type=int), 1), PHRASES_MAX_PAGE)
+    if cursor:
+        try:
+            query["ExclusiveStartKey"] = _decode_cursor(cursor, sub, kind)
+        except ValueError as e:
+            return json_error(str(e), 400)
+    _move_legacy_phrases(sub)
+    items = []
+    while True:
+        page = phrases_table.query(**query)
+        items += page.get("Items", [])
+        if paged or not page.get("LastEvaluatedKey"):
+            break
+        query["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+    resp = jsonify([_phrase_record(entry) for entry in items])
+    if paged and page.get("LastEvaluatedKey"):
+        resp.headers["X-Next-Cursor"] = _encode_cursor(page["LastEvaluatedKey"])
+    return resp, 200
+
+def _add_phrase(sub: str, kind: str, text: str, image_key: Optional[str]) -> Dict[str, Any]:
+    created = time.time()
+    entry: Dict[str, Any] = {"id": _new_phrase_id(created), "created": int(created)}
+    if text:
+        entry["text"] = text
+    if image_key:
+        entry["image_key"] = image_key
+    item = {k: v for k, v in entry.items() if k != "id"}
+    _move_legacy_phrases(sub)
+    phrases_table.put_item(Item={"users": sub, "sk": f"{kind}#{entry['id']}", **item})
+    return entry
+
+def _delete_phrase(sub: str, kind: str, item_id: str) -> Optional[Dict[str, Any]]:
+    """Deletes the entry and its image; returns the entry, or None if there was none."""
+    _move_legacy_phrases(sub)
+    old = phrases_table.delete_item(Key={"users": sub, "sk": f"{kind}#{item_id}"},
+                                    ReturnValues="ALL_OLD").get("Attributes")
+    if not old:
+        return None
+    if old.get("image_key"):
+        try:
+            s3.delete_object(Bucket=USERS_BUCKET, Key=old["image_key"])
+            log.info(f"Deleted {kind} image from S3: {old['image_key']}")
+        except Exception as e:
+            log.error(f"Failed to delete {kind} image from S3: {str(e)}")
+    entry = {k: v for k, v in old.items() if k not in ("users", "sk")}
+    entry["id"] = item_id
+    return entry
+
 @app.route("/saved_phrases", methods=["GET"])
 @require_jwt
 def saved_phrases():
     who = profile_from_claims(getattr(g, "jwt_claims", {}))
-    sub = who["sub"]
-
-    item = table.get_item(Key={"users": str(sub)}).get("Item", {})
-    out = []
-    for entry in item.get("phrases", []):
-        rec = {
-            "id": entry.get("id") or "", 
-            "text": entry.get("text", ""),
-            "created": entry.get("created"),
-        }
-        if entry.get("image_key"):
-            rec["image_url"] = _presign(USERS_BUCKET, entry["image_key"])
-        out.append(rec)
-
-    out.sort(key=lambda r: r.get("created") or 0, reverse=True)
-    return jsonify(out), 200
+    return _list_phrases(str(who["sub"]), "saved")
 
 @app.route("/saved_delete/<item_id>", methods=["DELETE"])
 @require_jwt
@@ -274,32 +824,9 @@ def saved_delete(item_id):
     who = profile_from_claims(getattr(g, "jwt_claims", {}))
     sub = who["sub"]
 
-    item = table.get_item(Key={"users": sub}).get("Item") or {}
-    phrases = item.get("phrases", [])
-
-    deleted_phrase = None
-    new_phrases = []
-    for p in phrases:
-        if p.get("id") == item_id:
-            deleted_phrase = p
-        else:
-            new_phrases.append(p)
-
-    if deleted_phrase and deleted_phrase.get("image_key"):
-        try:
-            s3.delete_object(Bucket=USERS_BUCKET, Key=deleted_phrase["image_key"])
-            log.info(f"Deleted image from S3: {deleted_phrase['image_key']}")
-        except Exception as e:
-            log.error(f"Failed to delete image from S3: {str(e)}")
-
-    if "phrases" in item:
-        table.update_item(
-            Key={"users": sub},
-            UpdateExpression="SET phrases = :p",
-            ExpressionAttributeValues={":p": new_phrases},
-        )
-    else:
-        table.put_item(Item={"users": sub, "phrases": new_phrases})
+    if not _PHRASE_ID.match(item_id):
+        return jsonify({"error": "Invalid item ID"}), 400
+    _delete_phrase(sub, "saved", item_id)
 
     return jsonify({"status": "ok", "deleted": item_id}), 200
 
@@ -308,25 +835,7 @@ def saved_delete(item_id):
 @require_jwt
 def emergency_phrases():
     who = profile_from_claims(getattr(g, "jwt_claims", {}))
-    sub = who["sub"]
-
-    item = table.get_item(Key={"users": str(sub)}).get("Item", {})
-    em_list = item.get("emergency", [])
-    out = []
-    for i, entry in enumerate(em_list):
-        text = entry.get("text") or ""
-        image_key = entry.get("image_key")
-        rec = {
-            "id": str(i),
-            "text": text,
-            "created": entry.get("created"),
-        }
-        if image_key:
-            rec["image_url"] = _presign(USERS_BUCKET, image_key)
-        out.append(rec)
-
-    out.sort(key=lambda r: r.get("created") or 0, reverse=True)
-    return jsonify(out), 200
+    return _list_phrases(str(who["sub"]), "emergency")
 
 @app.route("/emergency_delete/<item_id>", methods=["DELETE"])
 @require_jwt
@@ -334,36 +843,12 @@ def emergency_delete(item_id):
     who = profile_from_claims(getattr(g, "jwt_claims", {}))
     sub = who["sub"]
 
-    try:
-        item_id_int = int(item_id)
-    except ValueError:
+    if not _PHRASE_ID.match(item_id):
         return jsonify({"error": "Invalid item ID"}), 400
-
-    item = table.get_item(Key={"users": sub}).get("Item") or {}
-    emergency_list = item.get("emergency", [])
-
-    if item_id_int >= len(emergency_list):
+    deleted_item = _delete_phrase(sub, "emergency", item_id)
+    if deleted_item is None:
         return jsonify({"error": "Item not found"}), 404
 
-    deleted_item = emergency_list.pop(item_id_int)
-
-    image_key = deleted_item.get("image_key")
-    if image_key:
-        try:
-            s3.delete_object(Bucket=USERS_BUCKET, Key=image_key)
-            log.info(f"Deleted emergency image from S3: {image_key}")
-        except Exception as e:
-            log.error(f"Failed to delete emergency image from S3: {str(e)}")
-
-    if "emergency" in item:
-        table.update_item(
-            Key={"users": sub},
-            UpdateExpression="SET emergency = :e",
-            ExpressionAttributeValues={":e": emergency_list},
-        )
-    else:
-        table.put_item(Item={"users": sub, "emergency": emergency_list})
-
     return jsonify({"status": "ok", "deleted": item_id, "deleted_item": deleted_item}), 200
 
 
@@ -396,25 +881,7 @@ def emergency_add():
         except Exception as e:
             return jsonify({"error": f"Image upload failed: {str(e)}"}), 500
 
-    new_entry = {"created": int(time.time())}
-    if text:
-        new_entry["text"] = text
-    if image_key:
-        new_entry["image_key"] = image_key
-
-    item = table.get_item(Key={"users": sub}).get("Item")
-    if item and "emergency" in item:
-        table.update_item(
-            Key={"users": sub},
-            UpdateExpression="SET emergency = list_append(:new, emergency)",
-            ExpressionAttributeValues={":new": [new_entry]},
-        )
-    else:
-        if item:
-            item["emergency"] = [new_entry]
-            table.put_item(Item=item)
-        else:
-            table.put_item(Item={"users": sub, "emergency": [new_entry]})
+    new_entry = _add_phrase(sub, "emergency", text, image_key)
 
     resp = {"status": "ok", "added": new_entry}
     if image_key:
@@ -449,28 +916,7 @@ def addsaved():
         except Exception as e:
             return jsonify({"error": f"Image upload failed: {str(e)}"}), 500
 
-    new_entry = {
-        "id": str(uuid.uuid4()),
-        "created": int(time.time()),
-    }
-    if text:
-        new_entry["text"] = text
-    if image_key:
-        new_entry["image_key"] = image_key
-
-    item = table.get_item(Key={"users": sub}).get("Item")
-    if item and "phrases" in item:
-        table.update_item(
-            Key={"users": sub},
-            UpdateExpression="SET phrases = list_append(:new, phrases)",
-            ExpressionAttributeValues={":new": [new_entry]},
-        )
-    else:
-        if item:
-            item["phrases"] = [new_entry]
-            table.put_item(Item=item)
-        else:
-            table.put_item(Item={"users": sub, "phrases": [new_entry]})
+    new_entry = _add_phrase(sub, "saved", text, image_key)
 
     resp = {"status": "ok", "added": new_entry}
     if image_key:
@@ -495,40 +941,617 @@ def _object_exists(bucket: str, key: str) -> bool:
             return False
         raise
 
-def _presign(bucket: str, key: str, seconds: int = PRESIGN_EXPIRES) -> str:
+# Presigned URLs: cached per (bucket, key) and handed out again while they still
+# have more than (1 - PRESIGN_REUSE) of PRESIGN_EXPIRES left, so popular clips are
+# signed once per reuse window. A URL stops working when the temporary credentials
+# it was signed with expire (profile/SSO/assume-role/instance credentials), so its
+# lifetime is capped at their expiry, and it is not handed out any more once
+# botocore has rotated to new credentials. Misses are signed locally (SigV4 query
+# auth, the same URL botocore produces) once botocore has signed one URL for the bucket.
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+class LocalSigner:
+    def __init__(self):
+        self._endpoints: Dict[str, Optional[tuple[str, str, str]]] = {}  # bucket -> (base, host, path prefix)
+        self._signing_keys: Dict[tuple[str, str], bytes] = {}
+
+    def _signing_key(self, secret: str, date: str, region: str) -> bytes:
+        k = self._signing_keys.get((secret, date))
+        if k is None:
+            k = ("AWS4" + secret).encode()
+            for part in (date, region, "s3", "aws4_request"):
+                k = hmac.new(k, part.encode(), hashlib.sha256).digest()
+            self._signing_keys = {(secret, date): k}  # one day's key is all that is needed
+        return k
+
+    def _learn(self, bucket: str, key: str, url: str) -> None:
+        parts = urlsplit(url)
+        suffix = "/" + _quote(key, safe="/~")
+        # an addressing style we cannot reproduce keeps going through botocore
+        ok = parts.path.endswith(suffix) and "X-Amz-Signature=" in parts.query
+        self._endpoints[bucket] = ((f"{parts.scheme}://{parts.netloc}", parts.netloc,
+                                    parts.path[:-len(suffix)]) if ok else None)
+
+    def sign(self, bucket: str, key: str, seconds: int) -> str:
+        if bucket not in self._endpoints:
+            url = _botocore_presign(bucket, key, seconds)
+            self._learn(bucket, key, url)
+            return url
+        endpoint = self._endpoints[bucket]
+        if endpoint is None:
+            return _botocore_presign(bucket, key, seconds)
+        base, host, prefix = endpoint
+        creds = session.get_credentials().get_frozen_credentials()
+        region = s3.meta.region_name
+        amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        scope = f"{amz_date[:8]}/{region}/s3/aws4_request"
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{creds.access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(seconds),
+            "X-Amz-SignedHeaders": "host",
+        }
+        if creds.token:
+            params["X-Amz-Security-Token"] = creds.token
+        encoded = [f"{_quote(k)}={_quote(v)}" for k, v in params.items()]
+        path = prefix + "/" + _quote(key, safe="/~")
+        canonical = f"GET\n{path}\n{'&'.join(sorted(encoded))}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+        string_to_sign = "\n".join(("AWS4-HMAC-SHA256", amz_date, scope,
+                                    hashlib.sha256(canonical.encode()).hexdigest()))
+        signature = hmac.new(self._signing_key(creds.secret_key, amz_date[:8], region),
+                             string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{base}{path}?{'&'.join(encoded)}&X-Amz-Signature={signature}"
+
+def _signing_credentials() -> tuple[str, Optional[float]]:
+    """(identity, expiry as epoch seconds or None) of the credentials URLs are signed with now."""
+    creds = session.get_credentials()
+    frozen = creds.get_frozen_credentials()  # refreshes them first when they are due
+    expiry = getattr(creds, "_expiry_time", None)  # only RefreshableCredentials expire
+    identity = hashlib.sha256(f"{frozen.access_key}:{frozen.token or ''}".encode()).hexdigest()[:16]
+    return identity, expiry.timestamp() if expiry else None
+
+class PresignCache:
+    def __init__(self, size: int, expires: float, min_left: float, credentials=_signing_credentials):
+        self.size = size
+        self.expires = expires
+        self.min_left = min_left  # seconds a URL handed out again must still be valid for
+        self._credentials = credentials
+        self._entries: "OrderedDict[tuple[str, str], tuple[str, str, float]]" = OrderedDict()  # url, identity, valid until
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.refreshes = 0
+
+    def get(self, bucket: str, key: str, sign) -> str:
+        now = time.time()
+        identity, cred_expiry = self._credentials()
+        fresh_until = min(now + self.expires, cred_expiry or float("inf"))
+        with self._lock:
+            entry = self._entries.get((bucket, key))
+            # a URL signed with the current credentials that lives as long as a new one would is as good
+            if entry and entry[1] == identity and entry[2] - now >= min(self.min_left, fresh_until - now):
+                self._entries.move_to_end((bucket, key))
+                self.hits += 1
+                return entry[0]
+            if entry:
+                self.refreshes += 1
+            else:
+                self.misses += 1
+        url = sign(bucket, key)
+        with self._lock:
+            self._entries[(bucket, key)] = (url, identity, fresh_until)
+            self._entries.move_to_end((bucket, key))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return url
+
+    def status(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.refreshes
+        return {"entries": len(self._entries), "size": self.size, "hits": self.hits,
+                "misses": self.misses, "refreshes": self.refreshes,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None}
+
+local_signer = LocalSigner()
+presign_cache = PresignCache(PRESIGN_CACHE_SIZE, PRESIGN_EXPIRES, PRESIGN_EXPIRES * (1 - PRESIGN_REUSE))
+
+def _botocore_presign(bucket: str, key: str, seconds: int) -> str:
     return s3.generate_presigned_url(
         "get_object",
         Params={"Bucket": bucket, "Key": key},
         ExpiresIn=seconds,
     )
 
+def _sign(bucket: str, key: str, seconds: int = PRESIGN_EXPIRES) -> str:
+    with metrics.stage("s3.presign"):
+        if PRESIGN_LOCAL:
+            return local_signer.sign(bucket, key, seconds)
+        return _botocore_presign(bucket, key, seconds)
+
+def _presign(bucket: str, key: str, seconds: int = PRESIGN_EXPIRES) -> str:
+    if seconds != PRESIGN_EXPIRES or PRESIGN_CACHE_SIZE <= 0:
+        return _sign(bucket, key, seconds)
+    return presign_cache.get(bucket, key, _sign)
+
+def _presign_many(bucket: str, keys: list[str]) -> Dict[str, str]:
+    """One URL per distinct key (letters repeat a lot in fingerspelled text)."""
+    return {key: _presign(bucket, key) for key in dict.fromkeys(keys)}
+
+# Sentence composites: the clips of a sentence joined into one MP4 by ffmpeg's
+# concat demuxer with stream copy (the catalog clips share codec, size and frame
+# rate), stored in S3_BUCKET under a key derived from the ordered clip keys and
+# their ETags. A composite is built once per process however many requests ask
+# for it at the same time; later requests only presign it.
+
+class CompositeError(Exception):
+    pass
+
+def _composite_key(keys: list[str]) -> str:
+    digest = hashlib.sha256("\n".join(f"{k} {catalog.etag(k)}" for k in keys).encode()).hexdigest()
+    return f"{COMPOSE_PREFIX}{digest[:40]}.mp4"
+
+class Compositor:
+    def __init__(self, known_size: int):
+        self.known_size = known_size
+        self._known: "OrderedDict[str, None]" = OrderedDict()  # composite keys that exist in S3
+        self._building: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.built = self.reused = self.joined = self.failed = 0
+
+    def _remember(self, ckey: str) -> None:
+        with self._lock:
+            self._known[ckey] = None
+            self._known.move_to_end(ckey)
+            while len(self._known) > self.known_size:
+                self._known.popitem(last=False)
+
+    def get(self, keys: list[str]) -> str:
+        """Composite key for the clips, building and uploading it if needed."""
+        ckey = _composite_key(keys)
+        with self._lock:
+            if ckey in self._known:
+                self._known.move_to_end(ckey)
+                self.reused += 1
+                return ckey
+            pending = self._building.get(ckey)
+            if pending is None:
+                pending = self._building[ckey] = Future()
+                owner = True
+            else:
+                self.joined += 1
+                owner = False
+        if not owner:
+            return pending.result()
+
+        try:
+            if _object_exists(S3_BUCKET, ckey):  # built earlier or by another process
+                self.reused += 1
+            else:
+                self._build(keys, ckey)
+                self.built += 1
+            self._remember(ckey)
+            pending.set_result(ckey)
+            return ckey
+        except Exception as e:
+            self.failed += 1
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._building.pop(ckey, None)
+
+    def _build(self, keys: list[str], ckey: str) -> None:
+        with tempfile.TemporaryDirectory(prefix="compose-") as tmp:
+            paths = {k: os.path.join(tmp, f"{i}.mp4") for i, k in enumerate(dict.fromkeys(keys))}
+            with metrics.stage("compose.download"), ThreadPoolExecutor(COMPOSE_DOWNLOADS) as ex:
+                list(ex.map(lambda k: s3.download_file(S3_BUCKET, k, paths[k]), paths))
+            listing = os.path.join(tmp, "clips.txt")
+            with open(listing, "w") as f:
+                f.writelines(f"file '{paths[k]}'\n" for k in keys)
+            out = os.path.join(tmp, "out.mp4")
+            cmd = [FFMPEG, "-hide_banner", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                   "-i", listing, "-c", "copy", "-movflags", "+faststart", out]
+            with metrics.stage("compose.ffmpeg"):
+                try:
+                    proc = subprocess.run(cmd, capture_output=True, timeout=COMPOSE_TIMEOUT)
+                except FileNotFoundError:
+                    raise CompositeError(f"{FFMPEG} not found")
+                except subprocess.TimeoutExpired:
+                    raise CompositeError(f"ffmpeg took longer than {COMPOSE_TIMEOUT} s")
+            if proc.returncode != 0:
+                raise CompositeError(proc.stderr.decode(errors="replace").strip()[-500:])
+            with metrics.stage("compose.upload"):
+                s3.upload_file(out, S3_BUCKET, ckey, ExtraArgs={"ContentType": "video/mp4"})
+        log.info("compose: %s from %d clips", ckey, len(keys))
+
+    def status(self) -> Dict[str, Any]:
+        return {"known": len(self._known), "building": len(self._building), "built": self.built,
+                "reused": self.reused, "joined": self.joined, "failed": self.failed}
+
+compositor = Compositor(COMPOSE_CACHE_SIZE)
+
+def _composite(keys: list[str]) -> Optional[Dict[str, str]]:
+    """{"key", "url"} of the sentence as one video, or None when it cannot be built."""
+    if not keys:
+        return None
+    if len(keys) == 1:
+        return {"key": keys[0], "url": _presign(S3_BUCKET, keys[0])}
+    try:
+        ckey = compositor.get(keys)
+    except Exception as e:
+        log.warning("compose: %d clips failed (%s), falling back to the clip list", len(keys), e)
+        return None
+    return {"key": ckey, "url": _presign(S3_BUCKET, ckey)}
+
 @app.post("/text-to-sign")
 @require_jwt
 def text_to_sign():
+    """{"text"[, "compose": true]} -> {"videos": [...]}; with compose also
+    {"composite": {"key", "url"}} (null if it could not be built) to play the
+    whole sentence as a single video."""
     data = request.get_json(silent=True) or {}
     text = (data.get("text") or "").strip()
     if not text:
         return jsonify({"videos": []}), 200
 
-    # Normalize input and split into words
-    norm = normalize_ar(text)
-    words = norm.split()
-
-    results = []
-    total = 0
-    for w in words:
-        pairs = _expand_word_to_tokens(w)  # [(token, key), ...]
-        for token, key in pairs:
-            url = _presign(S3_BUCKET, key)
-            results.append({"token": token, "url": url, "key": key})
-            total += 1
-            if total >= MAX_RETURNED_CLIPS:
-                break
-        if total >= MAX_RETURNED_CLIPS:
-            break
+    pairs = _resolve(normalize_ar(text))
+    urls = _presign_many(S3_BUCKET, [key for _, key in pairs])
+    results = [{"token": token, "url": urls[key], "key": key} for token, key in pairs]
+    if data.get("compose"):
+        return jsonify({"videos": results, "composite": _composite([key for _, key in pairs])}), 200
 
     return jsonify({"videos": results}), 200
 
+@app.post("/text-to-sign/batch")
+@require_jwt
+def text_to_sign_batch():
+    """{"texts": [...]} -> {"results": [{"text", "videos"}, ...]} in the same order;
+    repeated texts are resolved once and every distinct clip is signed once."""
+    data = request.get_json(silent=True) or {}
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return json_error("texts must be a list of strings", 400)
+    if len(texts) > MAX_BATCH_TEXTS:
+        return json_error(f"at most {MAX_BATCH_TEXTS} texts per request", 400)
+
+    norms = [normalize_ar(t.strip()) for t in texts]
+    resolved = {norm: _resolve(norm) for norm in dict.fromkeys(norms) if norm}
+    urls = _presign_many(S3_BUCKET, [key for pairs in resolved.values() for _, key in pairs])
+    results = [{"text": text, "videos": [{"token": token, "url": urls[key], "key": key}
+                                         for token, key in resolved.get(norm, [])]}
+               for text, norm in zip(texts, norms)]
+    return jsonify({"results": results}), 200
+
+# ML service client: one keep-alive connection pool, timeouts on every call, request
+# ids forwarded. Async /signtoarabic spools the upload to disk (hashing it on the
+# way), answers 202 with a job id and runs the prediction on a small pool; uploads
+# identical to a job that is pending or recently finished get that job.
+#
+# Requests are spread over ML_SERVICE_URLS by least outstanding requests. Replicas
+# failing /ready are skipped, and ML_EJECT_FAILURES consecutive failures (connection
+# errors, 5xx) eject one for ML_EJECT_SECONDS; when nothing is left every replica is
+# tried anyway. A connection failure or a busy replica (429/503) is retried once on
+# another one, and with ML_HEDGE a second copy goes out after the path's p95 latency
+# and the first good answer wins. Streamed bodies are sent once, without either.
+
+class MLReplica:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.failures = 0  # consecutive
+        self.ejected_until = 0.0
+        self.healthy = True
+        self.requests = self.errors = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def status(self) -> Dict[str, Any]:
+        return {"url": self.url, "healthy": self.healthy, "ejected": self.ejected_until > time.time(),
+                "outstanding": self.outstanding, "requests": self.requests, "errors": self.errors}
+
+class MLReplicas:
+    def __init__(self, urls: list[str], http: requests.Session, hedge: bool = False):
+        self.replicas = [MLReplica(u) for u in urls]
+        self.http = http
+        self.hedge = hedge and len(self.replicas) > 1
+        self._lock = threading.Lock()
+        self._latency: Dict[str, deque] = {}  # path -> recent successful latencies (s)
+        self._hedger = ThreadPoolExecutor(4 * ML_POOL_SIZE, thread_name_prefix="ml-hedge") if self.hedge else None
+        self.hedged = self.hedge_wins = self.failovers = 0
+
+    def _pick(self, exclude: tuple = ()) -> Optional[MLReplica]:
+        now = time.time()
+        with self._lock:
+            candidates = [r for r in self.replicas if r not in exclude]
+            candidates = [r for r in candidates if r.available(now)] or candidates
+            if not candidates:
+                return None
+            fewest = min(r.outstanding for r in candidates)
+            replica = random.choice([r for r in candidates if r.outstanding == fewest])
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+
+    def _finish(self, replica: MLReplica, ok: bool, path: str, seconds: float, counted: bool = True) -> None:
+        with self._lock:
+            replica.outstanding -= 1
+            if not counted:  # the losing copy of a hedged request
+                return
+            if ok:
+                replica.failures = 0
+                self._latency.setdefault(path, deque(maxlen=200)).append(seconds)
+                return
+            replica.errors += 1
+            replica.failures += 1
+            if replica.failures >= ML_EJECT_FAILURES:
+                replica.ejected_until = time.time() + ML_EJECT_SECONDS
+                log.warning("ML replica %s ejected for %.0f s after %d failures",
+                            replica.url, ML_EJECT_SECONDS, replica.failures)
+
+    def _send(self, replica: MLReplica, path: str, data, headers: Dict[str, str],
+              race: Optional[Dict[str, bool]] = None) -> requests.Response:
+        t0 = time.perf_counter()
+        try:
+            resp = self.http.post(f"{replica.url}{path}", data=data, headers=headers,
+                                  timeout=(ML_CONNECT_TIMEOUT, ML_READ_TIMEOUT))
+        except requests.RequestException:
+            self._finish(replica, False, path, 0.0, counted=not (race and race["decided"]))
+            raise
+        self._finish(replica, resp.status_code < 500, path, time.perf_counter() - t0,
+                     counted=not (race and race["decided"]))
+        return resp
+
+    def hedge_delay(self, path: str) -> float:
+        with self._lock:
+            samples = sorted(self._latency.get(path, ()))
+        if len(samples) < 20:
+            return ML_HEDGE_DEFAULT_DELAY
+        return max(samples[int(0.95 * (len(samples) - 1))], ML_HEDGE_MIN_DELAY)
+
+    @staticmethod
+    def _good(resp: requests.Response) -> bool:
+        return resp.status_code < 500 and resp.status_code != 429
+
+    def post(self, path: str, data, headers: Dict[str, str], resendable: bool = True) -> requests.Response:
+        first = self._pick()
+        if first is None:
+            raise requests.ConnectionError("no ML replicas configured")
+        if self.hedge and resendable:
+            return self._hedged(first, path, data, headers)
+        try:
+            resp = self._send(first, path, data, headers)
+        except requests.ConnectionError:  # incl. connect timeouts; read timeouts are not retried
+            second = self._pick(exclude=(first,)) if resendable else None
+            if second is None:
+                raise
+            self.failovers += 1
+            return self._send(second, path, data, headers)
+        if resendable and resp.status_code in (429, 503):
+            second = self._pick(exclude=(first,))
+            if second is not None:
+                self.failovers += 1
+                return self._send(second, path, data, headers)
+        return resp
+
+    def _hedged(self, first: MLReplica, path: str, data, headers: Dict[str, str]) -> requests.Response:
+        race = {"decided": False}
+        futures = [self._hedger.submit(self._send, first, path, data, headers, race)]
+        done, _ = wait(futures, timeout=self.hedge_delay(path))
+        if done and not futures[0].exception() and self._good(futures[0].result()):
+            return futures[0].result()
+        # slower than the p95, or already failed: a second replica gets a copy
+        second = self._pick(exclude=(first,))
+        if second is not None:
+            self.hedged += 1
+            futures.append(self._hedger.submit(self._send, second, path, data, headers, race))
+
+        pending, answer, error = set(futures), None, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception():
+                    error = f.exception()
+                    continue
+                answer = f.result()
+                if self._good(answer):
+                    race["decided"] = True
+                    if f is not futures[0]:
+                        self.hedge_wins += 1
+                    return answer
+        race["decided"] = True
+        if answer is not None:
+            return answer
+        raise error
+
+    def check_health(self) -> None:
+        for replica in self.replicas:
+            try:
+                ok = self.http.get(f"{replica.url}/ready", timeout=(ML_CONNECT_TIMEOUT, 5)).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok != replica.healthy:
+                log.warning("ML replica %s is %s", replica.url, "ready" if ok else "not ready")
+            replica.healthy = ok
+
+    def status(self) -> Dict[str, Any]:
+        return {"replicas": [r.status() for r in self.replicas], "hedge": self.hedge,
+                "hedged": self.hedged, "hedge_wins": self.hedge_wins, "failovers": self.failovers}
+
+ml_http = requests.Session()
+_ml_adapter = HTTPAdapter(pool_connections=len(ML_SERVICE_URLS), pool_maxsize=ML_POOL_SIZE)
+ml_http.mount("http://", _ml_adapter)
+ml_http.mount("https://", _ml_adapter)
+ml_replicas = MLReplicas(ML_SERVICE_URLS, ml_http, hedge=ML_HEDGE)
+
+def _check_ml_forever() -> None:
+    while True:
+        ml_replicas.check_health()
+        time.sleep(ML_HEALTH_SECONDS)
+
+def _ml_post(path: str, headers: Dict[str, str], request_id: Optional[str] = None,
+             data=None, resendable: bool = True) -> requests.Response:
+    rid = request_id or metrics.request_id()
+    if rid:
+        headers = {**headers, metrics.REQUEST_ID_HEADER: rid}
+    with metrics.stage("ml_predict"):
+        return ml_replicas.post(path, data, headers, resendable=resendable)
+
+def _ml_reply(resp: requests.Response) -> tuple[Dict[str, Any], int]:
+    try:
+        body = resp.json()
+    except ValueError:
+        body = {}
+    if resp.status_code == 200 and "text" in body:
+        return {"text": body["text"]}, 200
+    return {"error": body.get("error", "Prediction failed")}, resp.status_code if resp.status_code >= 400 else 502
+
+def _ml_failure(e: requests.RequestException) -> tuple[Dict[str, Any], int]:
+    log.warning("ML service call failed: %s", e)
+    if isinstance(e, requests.Timeout):
+        return {"error": "ML service timed out"}, 504
+    return {"error": "ML service unavailable"}, 502
+
+class MultipartFile:
+    """multipart/form-data body with a single file field, read from `fileobj` in
+    STREAM_CHUNK pieces while it is sent (requests streams sized iterables)."""
+
+    def __init__(self, field: str, filename: str, fileobj, content_type: str = "application/octet-stream"):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._head = (f"--{boundary}\r\n"
+                      f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                      f"Content-Type: {content_type}\r\n\r\n").encode()
+        self._tail = f"\r\n--{boundary}--\r\n".encode()
+        self._file = fileobj
+        self._file.seek(0, os.SEEK_END)
+        self._size = self._file.tell()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._head) + self._size + len(self._tail)
+
+    def __iter__(self):
+        # each pass keeps its own offset, so a retried or hedged copy can be sent alongside
+        yield self._head
+        offset = 0
+        while True:
+            with self._lock:
+                self._file.seek(offset)
+                chunk = self._file.read(STREAM_CHUNK)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+        yield self._tail
+
+class PredictionJob:
+    def __init__(self, digest: str, owner: str, instance: str):
+        self.id = f"{instance}.{uuid.uuid4().hex}"
+        self.digest = digest
+        self.owners = {owner}
+        self.request_id = metrics.request_id()  # of the upload that started it
+        self.status = "pending"  # -> running -> done | failed
+        self.result: Dict[str, Any] = {}
+        self.status_code = 202
+        self.finished_at = 0.0
+        self.done = threading.Event()
+
+class PredictionJobs:
+    """Async /signtoarabic jobs, held in this process's memory: a job can only be
+    polled on the process that took the upload. Run the backend as a single process
+    (threads for concurrency) or route /signtoarabic/jobs/<id> back to it (sticky
+    sessions). Job ids start with the process's instance tag, so a poll that lands on
+    another process is answered 421 instead of passing for an expired job."""
+
+    def __init__(self, workers: int, max_pending: int, ttl: float):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs: Dict[str, PredictionJob] = {}
+        self._by_digest: Dict[str, PredictionJob] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="ml-job")
+        self.deduplicated = 0
+        self._pid, self._instance = None, None
+
+    @property
+    def instance(self) -> str:
+        # per process, also when a preloading server forks after import
+        if self._pid != os.getpid():
+            self._pid, self._instance = os.getpid(), uuid.uuid4().hex[:8]
+        return self._instance
+
+    def held_elsewhere(self, job_id: str) -> bool:
+        return "." in job_id and job_id.split(".", 1)[0] != self.instance
+
+    @staticmethod
+    def _spool(stream) -> tuple[str, str]:
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(prefix="upload-", suffix=".mp4")
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = stream.read(STREAM_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        return path, digest.hexdigest()
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job in [j for j in self._jobs.values() if j.done.is_set() and j.finished_at < cutoff]:
+            del self._jobs[job.id]
+            if self._by_digest.get(job.digest) is job:
+                del self._by_digest[job.digest]
+
+    def submit(self, stream, owner: str) -> tuple[Optional[PredictionJob], int]:
+        path, digest = self._spool(stream)
+        with self._lock:
+            self._expire()
+            job = self._by_digest.get(digest)
+            if job is not None and job.status != "failed":
+                job.owners.add(owner)
+                self.deduplicated += 1
+                os.unlink(path)
+                return job, 202
+            if sum(not j.done.is_set() for j in self._jobs.values()) >= self.max_pending:
+                os.unlink(path)
+                return None, 429
+            job = PredictionJob(digest, owner, self.instance)
+            self._jobs[job.id] = job
+            self._by_digest[digest] = job
+        self._executor.submit(self._run, job, path)
+        return job, 202
+
+    def _run(self, job: PredictionJob, path: str) -> None:
+        job.status = "running"
+        try:
+            with open(path, "rb") as f:
+                result, status = send_to_ml_model(f, request_id=job.request_id)
+        except Exception as e:
+            log.exception("prediction job %s failed", job.id)
+            result, status = {"error": f"Prediction failed: {e}"}, 500
+        finally:
+            os.unlink(path)
+        job.result, job.status_code = result, status
+        job.status = "done" if status == 200 else "failed"
+        job.finished_at = time.time()
+        job.done.set()
+
+    def get(self, job_id: str, owner: str) -> Optional[PredictionJob]:
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+        return job if job is not None and owner in job.owners else None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = sum(not j.done.is_set() for j in self._jobs.values())
+            return {"instance": self.instance, "jobs": len(self._jobs), "pending": pending,
+                    "deduplicated": self.deduplicated}
+
+prediction_jobs = PredictionJobs(ML_JOB_WORKERS, ML_MAX_PENDING_JOBS, ML_JOB_TTL_SECONDS)
+
 @app.route("/signtoarabic", methods=["POST"])
 @require_jwt
 def sign_to_arabic():
@@ -542,17 +1565,98 @@ def sign_to_arabic():
 
     video_file = request.files["video"]
 
-    video_bytes = video_file.read()
-    print(f"Received video bytes: {len(video_bytes)} bytes")
+    if request.args.get("async") in ("1", "true") or "respond-async" in request.headers.get("Prefer", ""):
+        job, status = prediction_jobs.submit(video_file.stream, sub)
+        if job is None:
+            return json_error("Too many pending predictions, retry later", status)
+        resp = jsonify({"job_id": job.id, "status": job.status})
+        resp.headers["Location"] = f"/signtoarabic/jobs/{job.id}"
+        return resp, 202
 
-    arabic_text = send_to_ml_model(video_bytes)
-    return jsonify({"text": arabic_text}), 200
+    body, status = send_to_ml_model(video_file.stream)
+    return jsonify(body), status
 
-def send_to_ml_model(video_bytes):
-    files = {"video": ("video.mp4", video_bytes)}
-    resp = requests.post("http://localhost:6000/predict", files=files)
+@app.route("/signtoarabic/jobs/<job_id>", methods=["GET"])
+@require_jwt
+def sign_to_arabic_job(job_id):
+    """Result of an async /signtoarabic; ?wait=N long-polls up to N seconds. 421 when
+    the poll reaches another backend process than the one holding the job."""
+    who = profile_from_claims(getattr(g, "jwt_claims", {}))
+    if prediction_jobs.held_elsewhere(job_id):
+        log.warning("job %s polled on backend instance %s; async jobs need a single process or sticky routing",
+                    job_id, prediction_jobs.instance)
+        return json_error("Job belongs to another (or a restarted) backend process", 421)
+    job = prediction_jobs.get(job_id, who["sub"])
+    if job is None:
+        return json_error("Unknown or expired job", 404)
+    wait = min(request.args.get("wait", 0.0, type=float), ML_JOB_MAX_WAIT)
+    if wait > 0:
+        job.done.wait(wait)
+    if not job.done.is_set():
+        return jsonify({"job_id": job.id, "status": job.status}), 202
+    return jsonify({"job_id": job.id, "status": job.status, **job.result}), job.status_code
+
+def send_to_ml_model(video, request_id: Optional[str] = None) -> tuple[Dict[str, Any], int]:
+    """POSTs a video (seekable file object) to the ML service as multipart, streamed
+    from the file; returns ({"text"} or {"error"}, status)."""
+    body = MultipartFile("video", "video.mp4", video)
+    try:
+        resp = _ml_post("/predict", data=body, headers={"Content-Type": body.content_type}, request_id=request_id)
+    except requests.RequestException as e:
+        return _ml_failure(e)
     print("sent")
-    return resp.json()["text"]
+    return _ml_reply(resp)
+
+@app.route("/signtoarabic/stream", methods=["POST"])
+@require_jwt
+def sign_to_arabic_stream():
+    # Raw video body (not multipart), piped to the ML service chunk by chunk so
+    # upload and landmarking overlap instead of buffering the whole clip here.
+    who = profile_from_claims(getattr(g, "jwt_claims", {}))
+    print("Received stream from:", who["sub"])
+
+    size = request.content_length or request.headers.get("X-Video-Size", type=int)
+    if not size and not request.headers.get("Transfer-Encoding"):
+        return jsonify({"error": "No video uploaded"}), 400
+
+    def chunks():
+        while True:
+            chunk = request.stream.read(STREAM_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+    headers = {"Content-Type": request.content_type or "application/octet-stream",
+               metrics.REQUEST_ID_HEADER: metrics.request_id()}
+    if size:
+        headers["X-Video-Size"] = str(size)
+    try:
+        resp = _ml_post("/predict/stream", data=chunks(), headers=headers, resendable=False)
+    except requests.RequestException as e:
+        body, status = _ml_failure(e)
+    else:
+        body, status = _ml_reply(resp)
+    return jsonify(body), status
+
+@app.route("/signtoarabic/keypoints", methods=["POST"])
+@require_jwt
+def sign_to_arabic_keypoints():
+    # Landmarks extracted on the device (binary payload, see ml_microservice/keypoints.py):
+    # a few tens of KB instead of the video, and no Holistic pass on the server.
+    who = profile_from_claims(getattr(g, "jwt_claims", {}))
+    print("Received landmarks from:", who["sub"])
+
+    payload = request.get_data()
+    if not payload:
+        return jsonify({"error": "No landmarks uploaded"}), 400
+
+    try:
+        resp = _ml_post("/predict/keypoints", data=payload, headers={"Content-Type": "application/octet-stream"})
+    except requests.RequestException as e:
+        body, status = _ml_failure(e)
+    else:
+        body, status = _ml_reply(resp)
+    return jsonify(body), status
 
 @app.route("/contact-support", methods=["POST"])
 @require_jwt
@@ -628,5 +1732,10 @@ def handle_500(e):
     return json_error("Internal Server Error", 500)
 
 if __name__ == "__main__":
+    # under the debug reloader only the serving child process starts up
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        threading.Thread(target=startup, name="startup", daemon=True).start()
     port = int(os.getenv("PORT", "5000"))
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=port, debug=True)
+else:
+    threading.Thread(target=startup, name="startup", daemon=True).start()
\ No newline at end of file
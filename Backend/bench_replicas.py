@@ -0,0 +1,138 @@
+'''
+Local check of the ML replica dispatcher (MLReplicas in app.py) against stand-in
+ML servers: throughput as replicas are added, tail latency with and without
+hedging, and a dead replica being ejected.
+
+    python bench_replicas.py [--requests N] [--median-ms 80] [--stall-p 0.03] [--stall-ms 800]
+
+Every stand-in is its own process that answers /ready and handles one /predict
+at a time (like one ml.py with one model), taking a log-normal service time
+around --median-ms and, with probability --stall-p, an extra --stall-ms stall.
+Clients are closed-loop threads posting a small payload through MLReplicas.post.
+'''
+import argparse, json, logging, math, os, random, socket, statistics, subprocess, sys, threading, time
+
+def serve(port, median, stall_p, stall, seed):
+    from werkzeug.serving import make_server
+    from werkzeug.wrappers import Request, Response
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    rng = random.Random(seed)
+    model = threading.Lock()
+
+    @Request.application
+    def app(request):
+        if request.path == "/ready":
+            return Response("{}", mimetype="application/json")
+        request.get_data()
+        with model:
+            delay = median * math.exp(rng.gauss(0.0, 0.25))
+            if rng.random() < stall_p:
+                delay += stall
+            time.sleep(delay)
+        return Response(json.dumps({"text": "ok", "port": port}), mimetype="application/json")
+
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_servers(n, args):
+    procs, urls = [], []
+    for i in range(n):
+        port = _free_port()
+        procs.append(subprocess.Popen([sys.executable, __file__, "--serve", str(port), "--median-ms", str(args.median_ms),
+                                       "--stall-p", str(args.stall_p), "--stall-ms", str(args.stall_ms), "--seed", str(i)]))
+        urls.append(f"http://127.0.0.1:{port}")
+    import requests
+    for url in urls:
+        for _ in range(100):
+            try:
+                requests.get(f"{url}/ready", timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.1)
+    return procs, urls
+
+def run(urls, concurrency, n_requests, hedge, warmup=40):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from app import MLReplicas
+
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(pool_connections=len(urls), pool_maxsize=64))
+    replicas = MLReplicas(urls, http, hedge=hedge)
+    payload = os.urandom(20_000)
+    for _ in range(warmup):  # latency samples for the hedge delay
+        replicas.post("/predict", payload, {"Content-Type": "application/octet-stream"})
+
+    latencies, errors, lock = [], [0], threading.Lock()
+    remaining = [n_requests]
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            t0 = time.perf_counter()
+            try:
+                ok = replicas.post("/predict", payload, {"Content-Type": "application/octet-stream"}).status_code == 200
+            except requests.RequestException:
+                ok = False
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+                errors[0] += not ok
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    ms = sorted(x * 1000.0 for x in latencies)
+    pct = lambda p: ms[min(len(ms) - 1, int(p * len(ms)))]
+    return {"rps": len(ms) / wall, "p50": statistics.median(ms), "p95": pct(0.95), "p99": pct(0.99),
+            "errors": errors[0], "status": replicas.status()}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--serve", type=int)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--median-ms", type=float, default=80)
+    ap.add_argument("--stall-p", type=float, default=0.03)
+    ap.add_argument("--stall-ms", type=float, default=800)
+    args = ap.parse_args()
+    if args.serve:
+        serve(args.serve, args.median_ms / 1000.0, args.stall_p, args.stall_ms / 1000.0, args.seed)
+        return
+
+    import app
+    logging.getLogger(app.log.name).setLevel(logging.ERROR)  # startup keeps retrying AWS in the background
+    procs, urls = start_servers(4, args)
+    try:
+        print(f"stand-ins: {args.median_ms:.0f} ms median, {args.stall_p:.0%} stalls of {args.stall_ms:.0f} ms, "
+              f"{args.requests} requests per row")
+        print(f"{'scenario':<34}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'hedged':>8}")
+        rows = [(f"{n} replica(s), 8 clients", urls[:n], 8, False) for n in (1, 2, 4)]
+        rows += [("4 replicas, 2 clients", urls, 2, False), ("4 replicas, 2 clients, hedged", urls, 2, True)]
+        dead = f"http://127.0.0.1:{_free_port()}"
+        rows += [("4 replicas + 1 dead, 8 clients", urls + [dead], 8, False)]
+        for name, replica_urls, concurrency, hedge in rows:
+            r = run(replica_urls, concurrency, args.requests, hedge)
+            print(f"{name:<34}{r['rps']:>8.1f}{r['p50']:>9.0f}{r['p95']:>9.0f}{r['p99']:>9.0f}"
+                  f"{r['errors']:>8}{r['status']['hedged']:>8}")
+            if replica_urls[-1] == dead:
+                d = r["status"]["replicas"][-1]
+                print(f"  dead replica: {d['requests']} requests incl. warm-up, ejected={d['ejected']}, "
+                      f"failovers={r['status']['failovers']}")
+    finally:
+        for p in procs:
+            p.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+'''
+Text-to-sign segmentation: the phrase/letter tries (SignTokenizer) against the
+per-word loop (_expand_word_to_tokens), both on an in-memory catalog.
+
+    python bench_tokenizer.py [--words N] [--phrases N] [--paragraph-words N] [--repeat N]
+
+The catalog is synthetic: the Arabic letters, "ال" and "لا", N random words
+and N multi-word phrases built from them. Paragraphs mix catalog words,
+phrases and unknown words (which fall back to fingerspelling). Reports the
+time per paragraph, the token lookups the per-word loop makes (each one an S3
+probe when the catalog is off) and checks that both agree on paragraphs
+without phrases.
+'''
+import argparse, logging, random, statistics, time
+
+import app
+from app import SignCatalog, _expand_word_to_tokens, normalize_ar
+
+LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهويءة"
+
+def synthetic_catalog(n_words, n_phrases, rng):
+    words = set()
+    while len(words) < n_words:
+        words.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(2, 7))))
+    words = sorted(words)
+    phrases = {" ".join(rng.sample(words, rng.randint(2, 4))) for _ in range(n_phrases)}
+    keys = [f"videos/ar/{w}.mp4" for w in [*words, *phrases]]
+    keys += [f"videos/ar/letters/{t}.mp4" for t in [*LETTERS, "ال", "لا"]]
+    return words, sorted(phrases), {k: "etag" for k in keys}
+
+def paragraph(n, words, phrases, rng, phrase_share):
+    out = []
+    while len(out) < n:
+        r = rng.random()
+        if phrases and r < phrase_share:
+            out += rng.choice(phrases).split()
+        elif r < 0.7:
+            out.append(rng.choice(words))
+        else:  # not in the catalog: fingerspelled
+            out.append(("ال" if rng.random() < 0.3 else "") +
+                       "".join(rng.choice(LETTERS + "أإآ") for _ in range(rng.randint(3, 8))))
+    return normalize_ar(" ".join(out[:n]))
+
+def per_word(norm):
+    return [pair for w in norm.split() for pair in _expand_word_to_tokens(w)]
+
+def count_lookups(texts):
+    """Token lookups the per-word loop makes; each is an S3 probe without the catalog."""
+    calls = [0]
+    word_key, letter_key = app._word_key, app._letter_key
+    def counted(fn):
+        def inner(token):
+            calls[0] += 1
+            return fn(token)
+        return inner
+    app._word_key, app._letter_key = counted(word_key), counted(letter_key)
+    try:
+        for t in texts:
+            per_word(t)
+    finally:
+        app._word_key, app._letter_key = word_key, letter_key
+    return calls[0] / len(texts)
+
+def timed(fn, texts, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        runs.append((time.perf_counter() - t0) / len(texts))
+    return statistics.median(runs) * 1000.0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--words", type=int, default=5000)
+    ap.add_argument("--phrases", type=int, default=500)
+    ap.add_argument("--paragraph-words", type=int, default=500)
+    ap.add_argument("--paragraphs", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    logging.getLogger(app.log.name).setLevel(logging.ERROR)  # startup keeps retrying AWS in the background
+
+    rng = random.Random(args.seed)
+    words, phrases, listing = synthetic_catalog(args.words, args.phrases, rng)
+    catalog = SignCatalog(app.S3_BUCKET, app.S3_KEY_PATTERNS, app.S3_LETTER_PATTERNS)
+    catalog._list = lambda: listing
+    t0 = time.perf_counter()
+    catalog.refresh()
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    app.catalog = catalog  # _expand_word_to_tokens resolves through the module-level catalog
+
+    plain = [paragraph(args.paragraph_words, words, [], rng, 0.0) for _ in range(args.paragraphs)]
+    mixed = [paragraph(args.paragraph_words, words, phrases, rng, 0.2) for _ in range(args.paragraphs)]
+    mismatches = sum(catalog.segment(t) != per_word(t) for t in plain)
+
+    print(f"catalog: {len(listing)} objects, index + tries built in {build_ms:.0f} ms")
+    print(f"{args.paragraphs} paragraphs of {args.paragraph_words} words, median of {args.repeat} runs")
+    print(f"{'text':<14}{'per-word ms':>13}{'lookups':>9}{'trie ms':>10}{'speed-up':>10}{'clips':>8}{'trie clips':>12}")
+    for name, texts in (("words only", plain), ("with phrases", mixed)):
+        a, b = timed(per_word, texts, args.repeat), timed(catalog.segment, texts, args.repeat)
+        n_a = sum(len(per_word(t)) for t in texts) / len(texts)
+        n_b = sum(len(catalog.segment(t)) for t in texts) / len(texts)
+        print(f"{name:<14}{a:>13.2f}{count_lookups(texts):>9.0f}{b:>10.2f}{a / b:>9.1f}x{n_a:>8.0f}{n_b:>12.0f}")
+    print(f"identical output on words-only paragraphs: {args.paragraphs - mismatches}/{args.paragraphs}")
+
+if __name__ == "__main__":
+    main()
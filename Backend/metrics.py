@@ -0,0 +1,150 @@
+'''
+Latency histograms and request tracing for a Flask service, exposed at GET /metrics
+in the Prometheus text format (no client library needed). The ML service and the
+backend each ship a copy of this file.
+
+  http_request_duration_seconds{route, method, status}   per request
+  stage_duration_seconds{stage}                           per internal step (stage())
+
+Every request carries an id (X-Request-ID, taken from the caller or generated),
+which is echoed in the response and should be forwarded on outgoing calls.
+Requests slower than SLOW_REQUEST_MS are logged as one JSON line with their id,
+route, status and per-stage breakdown. Work done for a request on another thread
+or in another process runs under collect_stages() and is handed back with
+add_stages(), so it shows up in both.
+'''
+import json, os, threading, time, uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+REQUEST_ID_HEADER = "X-Request-ID"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "2000"))
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if labels else ""
+            cumulative = 0
+            for le, n in zip([*map(str, self.buckets), "+Inf"], counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+request_seconds = Histogram("http_request_duration_seconds", "Request latency by route.",
+                            ("route", "method", "status"))
+stage_seconds = Histogram("stage_duration_seconds", "Latency of internal stages.", ("stage",))
+
+def render():
+    return "\n".join(request_seconds.render() + stage_seconds.render()) + "\n"
+
+_local = threading.local()  # collect_stages() state of the current thread
+
+def request_id():
+    """The current request's id (or the one collect_stages() runs with), or None."""
+    if has_request_context():
+        return g.get("request_id")
+    return getattr(_local, "request_id", None)
+
+def _add_to_request(name, seconds):
+    if has_request_context():
+        stages = g.setdefault("stages", {})
+        stages[name] = stages.get(name, 0.0) + seconds
+
+def observe_stage(name, seconds):
+    stage_seconds.observe(seconds, name)
+    _add_to_request(name, seconds)
+    collected = getattr(_local, "collected", None)
+    if collected is not None:
+        collected.append((name, seconds))
+
+@contextmanager
+def collect_stages(request_id=None):
+    """For request work running off the request thread: yields the list of
+    (stage, seconds) this thread observes inside the block, for add_stages() on the
+    request's side, and makes request_id() return request_id meanwhile."""
+    saved = getattr(_local, "collected", None), getattr(_local, "request_id", None)
+    _local.collected, _local.request_id = [], request_id
+    try:
+        yield _local.collected
+    finally:
+        _local.collected, _local.request_id = saved
+
+def add_stages(observations, observe=True):
+    """Adds collect_stages() output to the current request's breakdown and, with
+    observe (it came from another process), to stage_duration_seconds."""
+    for name, seconds in observations:
+        if observe:
+            stage_seconds.observe(seconds, name)
+        _add_to_request(name, seconds)
+
+@contextmanager
+def stage(name):
+    """Times the block into stage_duration_seconds and the request's slow-log breakdown."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0)
+
+def instrument(app, log=print, slow_ms=SLOW_REQUEST_MS):
+    """Adds request ids, per-route timing, the slow-request log and GET /metrics to app.
+    Call it before registering other before_request hooks so they are timed too."""
+
+    @app.before_request
+    def _start_request():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.request_t0 = time.perf_counter()
+
+    @app.after_request
+    def _finish_request(response):
+        t0 = g.get("request_t0")
+        if t0 is None:
+            return response
+        elapsed = time.perf_counter() - t0
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        request_seconds.observe(elapsed, route, request.method, str(response.status_code))
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        if elapsed * 1000.0 >= slow_ms:
+            log("slow request " + json.dumps({
+                "request_id": g.request_id,
+                "route": route,
+                "method": request.method,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000.0, 1),
+                "stages_ms": {k: round(v * 1000.0, 1) for k, v in g.get("stages", {}).items()},
+            }, ensure_ascii=False))
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,175 @@
+'''
+Moves saved and emergency phrases from the per-user lists in quicksign_no
+("phrases" and "emergency") into PHRASES_TABLE, one item per entry (partition key
+"users", sort key "sk" = "<kind>#<id>"), the layout app.py reads.
+
+    python migrate_phrases.py [--dry-run] [--create-table] [--profile P] [--region R]
+
+A user is moved with move_user(): their entries are written and their lists
+removed in DynamoDB transactions that only go through while the lists are exactly
+as read. Nothing is copied twice, so no phrase deleted in PHRASES_TABLE comes back,
+and a change the old backend makes in between (an add, a delete) makes the move
+start over from the current lists. app.py calls move_user() on a user's first
+phrases request, so the lists stay the source of truth until then.
+
+Ids are stable: saved phrases become "<created ms>-<old id>", emergency phrases
+(which only had a list index) get a uuid5 of the user and the entry.
+
+Rollout:
+  1. python migrate_phrases.py --create-table --dry-run   create the table, count what is to move
+  2. deploy the backend that reads PHRASES_TABLE (it moves users as they come)
+  3. python migrate_phrases.py                            move everyone else; rerun until it moves 0
+'''
+import argparse, json, os, random, time, uuid
+
+import boto3
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+SOURCE_TABLE = "quicksign_no"
+PHRASES_TABLE = os.getenv("PHRASES_TABLE", "quicksign_phrases")
+KINDS = (("phrases", "saved"), ("emergency", "emergency"))
+CHUNK = 99  # puts per transaction, plus the check on the source lists (limit 100)
+MOVE_ATTEMPTS = 5  # lost races before move_user() gives up until the next call
+MOVE_BACKOFF_S = 0.05  # first retry waits up to this, doubling per attempt
+_RACES = {"None", "ConditionalCheckFailed", "TransactionConflict"}  # cancellation reasons worth a retry
+_NAMESPACE = uuid.UUID("5b0c2a52-6f0e-4c8e-9a51-3f8f4d1b2e7a")
+_serializer = TypeSerializer()
+
+def phrase_id(sub, kind, entry, repeat):
+    created = int(entry.get("created") or 0)
+    if kind == "saved" and entry.get("id"):
+        suffix = str(entry["id"])
+    else:
+        seed = json.dumps([sub, kind, entry.get("text"), entry.get("image_key"), created, repeat], ensure_ascii=False)
+        suffix = uuid.uuid5(_NAMESPACE, seed).hex[:12]
+    return f"{created * 1000:013d}-{suffix}"
+
+def items_for(user):
+    sub = str(user["users"])
+    for attr, kind in KINDS:
+        seen = {}  # identical entries (same text, image and second) stay distinct
+        for entry in reversed(user.get(attr) or []):  # oldest first: new entries were prepended
+            key = (entry.get("text"), entry.get("image_key"), entry.get("created"))
+            seen[key] = seen.get(key, 0) + 1
+            item = {"users": sub, "sk": f"{kind}#{phrase_id(sub, kind, entry, seen[key])}"}
+            item.update({k: entry[k] for k in ("text", "image_key", "created") if entry.get(k) is not None})
+            yield item
+
+def _typed(item):
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+def _unchanged(user):
+    # condition that the user's lists are still the ones in user
+    names, values, parts = {}, {}, []
+    for i, (attr, _) in enumerate(KINDS):
+        names[f"#l{i}"] = attr
+        if attr in user:
+            values[f":l{i}"] = _serializer.serialize(user[attr])
+            parts.append(f"#l{i} = :l{i}")
+        else:
+            parts.append(f"attribute_not_exists(#l{i})")
+    condition = {"ConditionExpression": " AND ".join(parts), "ExpressionAttributeNames": names}
+    if values:
+        condition["ExpressionAttributeValues"] = values
+    return condition
+
+def move_user(source, target, sub, dry_run=False):
+    """Moves sub's lists from source into target; returns the number of entries moved
+    (0 when there were no lists). Safe to run concurrently and repeatedly.
+
+    Raises the TransactionCanceledException (a ClientError) after MOVE_ATTEMPTS lost
+    races, or at once when a transaction is cancelled for another reason (throttling,
+    a validation error); the lists are still in source then, for the next call."""
+    client = target.meta.client
+    written = set()
+    for attempt in range(MOVE_ATTEMPTS):
+        user = source.get_item(Key={"users": sub}, ConsistentRead=True).get("Item")
+        if not user or not any(attr in user for attr, _ in KINDS):
+            return 0
+        items = list(items_for(user))
+        if dry_run:
+            return len(items)
+        # entries put by an attempt that lost a race and are no longer in the lists
+        for sk in written - {item["sk"] for item in items}:
+            target.delete_item(Key={"users": str(sub), "sk": sk})
+        written.clear()
+
+        key, condition = _typed({"users": user["users"]}), _unchanged(user)
+        chunks = [items[i:i + CHUNK] for i in range(0, len(items), CHUNK)] or [[]]
+        try:
+            for n, chunk in enumerate(chunks):
+                actions = [{"Put": {"TableName": target.name, "Item": _typed(item)}} for item in chunk]
+                if n < len(chunks) - 1:
+                    actions.append({"ConditionCheck": {"TableName": source.name, "Key": key, **condition}})
+                else:
+                    actions.append({"Update": {"TableName": source.name, "Key": key,
+                                               "UpdateExpression": "REMOVE " + ", ".join(condition["ExpressionAttributeNames"]),
+                                               **condition}})
+                client.transact_write_items(TransactItems=actions)
+                written.update(item["sk"] for item in chunk)
+            return len(items)
+        except client.exceptions.TransactionCanceledException as e:
+            # the lists changed or another mover got there first: look again, after a
+            # jittered backoff so racing movers don't collide again
+            reasons = {r.get("Code", "None") for r in e.response.get("CancellationReasons", [])}
+            if not reasons <= _RACES or attempt == MOVE_ATTEMPTS - 1:
+                raise
+            time.sleep(random.uniform(0, MOVE_BACKOFF_S * 2 ** attempt))
+
+def scan_users(table):
+    kwargs = {"ProjectionExpression": "#u, phrases, emergency", "ExpressionAttributeNames": {"#u": "users"}}
+    while True:
+        page = table.scan(**kwargs)
+        for user in page.get("Items", []):
+            if any(attr in user for attr, _ in KINDS):
+                yield user["users"]
+        if "LastEvaluatedKey" not in page:
+            return
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+def create_table(dynamodb):
+    try:
+        table = dynamodb.create_table(
+            TableName=PHRASES_TABLE,
+            KeySchema=[{"AttributeName": "users", "KeyType": "HASH"},
+                       {"AttributeName": "sk", "KeyType": "RANGE"}],
+            AttributeDefinitions=[{"AttributeName": "users", "AttributeType": "S"},
+                                  {"AttributeName": "sk", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+    except dynamodb.meta.client.exceptions.ResourceInUseException:
+        print(f"{PHRASES_TABLE} already exists")
+        return
+    table.wait_until_exists()
+    print(f"created {PHRASES_TABLE}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true", help="count what would be moved, move nothing")
+    ap.add_argument("--create-table", action="store_true", help=f"create {PHRASES_TABLE} first if it is missing")
+    ap.add_argument("--profile")
+    ap.add_argument("--region", default=os.getenv("AWS_REGION", "eu-north-1"))
+    args = ap.parse_args()
+
+    dynamodb = boto3.Session(profile_name=args.profile, region_name=args.region).resource("dynamodb")
+    if args.create_table:
+        create_table(dynamodb)
+    source, target = dynamodb.Table(SOURCE_TABLE), dynamodb.Table(PHRASES_TABLE)
+
+    users = moved = failed = 0
+    for sub in scan_users(source):
+        try:
+            n = move_user(source, target, sub, dry_run=args.dry_run)
+        except ClientError as e:
+            print(f"could not move {sub}: {e}")
+            failed += 1
+            continue
+        users += n > 0
+        moved += n
+    verb = "would move" if args.dry_run else "moved"
+    print(f"{verb} {moved} phrases of {users} users from {SOURCE_TABLE} into {PHRASES_TABLE}"
+          + (f", {failed} users failed (rerun)" if failed else ""))
+
+if __name__ == "__main__":
+    main()
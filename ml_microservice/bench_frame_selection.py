@@ -0,0 +1,77 @@
+'''
+Latency / accuracy trade-off of the frame-selection settings in ml.py
+(FRAME_SAMPLING, LANDMARK_MAX_SIDE, MOTION_GATE).
+
+    python bench_frame_selection.py [--repeat N] [--json out.json] [clip_or_dir ...]
+
+Every configuration runs the full decode + Holistic + LSTM path on each clip.
+Top-1 agreement is measured against the legacy configuration (first 60 frames,
+full resolution); accuracy is reported for clips with a known label (see evalset.py).
+'''
+import argparse, json, time
+
+import numpy as np
+
+from evalset import load_clips
+from ml import FLIP_MODE, actions, model, predict_sequences, video_to_sequences
+
+CONFIGS = [
+    ("legacy (first, full res)", dict(sampling="first", max_side=0, motion_gate=0)),
+    ("uniform",                  dict(sampling="uniform", max_side=0, motion_gate=0)),
+    ("uniform, 640px",           dict(sampling="uniform", max_side=640, motion_gate=0)),
+    ("uniform, 480px",           dict(sampling="uniform", max_side=480, motion_gate=0)),
+    ("uniform, 320px",           dict(sampling="uniform", max_side=320, motion_gate=0)),
+    ("uniform, 480px, gate 2",   dict(sampling="uniform", max_side=480, motion_gate=2.0)),
+]
+
+def run(clips, repeat):
+    report, baseline = [], None
+    for name, opts in CONFIGS:
+        lat, preds, hits, labelled = [], [], 0, 0
+        for clip_name, video_bytes, label in clips:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                seq, fseq = video_to_sequences(video_bytes, 60, FLIP_MODE, **opts)
+                _, conf, probs = predict_sequences((seq, fseq), model, actions)
+                lat.append(time.perf_counter() - t0)
+            top1 = actions[int(np.argmax(probs))] if probs is not None else None
+            preds.append(top1)
+            if label:
+                labelled += 1
+                hits += top1 == label
+
+        baseline = baseline or preds
+        lat_ms = np.array(lat) * 1000.0
+        report.append({
+            "config": name,
+            **opts,
+            "latency_ms": {"mean": float(lat_ms.mean()), "p50": float(np.percentile(lat_ms, 50)),
+                           "p95": float(np.percentile(lat_ms, 95))},
+            "agreement_with_legacy": float(np.mean([a == b for a, b in zip(preds, baseline)])),
+            "accuracy": hits / labelled if labelled else None,
+            "labelled_clips": labelled,
+        })
+    return report
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json")
+    args = ap.parse_args()
+
+    clips = load_clips(args.paths, actions)
+    report = run(clips, args.repeat)
+
+    print(f"{len(clips)} clips, {args.repeat} runs each")
+    print(f"{'config':<28}{'mean ms':>10}{'p95 ms':>10}{'agree':>8}{'acc':>8}")
+    for r in report:
+        acc = f"{r['accuracy']:.2f}" if r["accuracy"] is not None else "-"
+        print(f"{r['config']:<28}{r['latency_ms']['mean']:>10.1f}{r['latency_ms']['p95']:>10.1f}"
+              f"{r['agreement_with_legacy']:>8.2f}{acc:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+'''
+Per-stage latency of the sign-to-Arabic pipeline (predict_from_bytes without the cache).
+
+    python bench_pipeline.py [--repeat N] [--no-samples] [--synthetic 30x480 90x720 ...]
+                             [--json out.json] [clip_or_dir ...]
+
+Runs on the clips in Text-to-Sign/Samples (or the given paths) and on synthetic
+clips of FRAMESxHEIGHT (16:9, moving shapes; they measure decode and scaling
+cost and Holistic's no-detection path). Each clip goes through the service's own
+video_to_sequences and predict_sequences with its current settings
+(FRAME_SAMPLING, LANDMARK_MAX_SIDE, LANDMARK_PROFILE and its HAND_CROP,
+MOTION_GATE, FLIP_MODE); the stages are the metrics.stage() observations they
+make, caught with metrics.collect_stages():
+
+  open       bytes -> cv2.VideoCapture (incl. the spool file when in-memory decode is unavailable)
+  decode     next sampled frame, incl. the grab()s that skip the frames in between
+  downscale  LANDMARK_MAX_SIDE resize
+  gate       MotionGate check (only with MOTION_GATE)
+  crop       HandCrop (only with a cropping profile)
+  color      BGR -> RGB (and cv2.flip under reflip)
+  holistic   hol.process (both graphs under reflip)
+  keypoints  KeypointBuffer.append (landmarks out of the protos)
+  normalize  the (60, 258) sequence and its flipped twin
+  predict    model.predict on both
+
+Per stage p50/p95/p99 over all calls; per clip frames per second, the process
+RSS after the clip and how far the clip raised the process's peak RSS (0 once
+an earlier, larger clip set the peak). The JSON report carries the commit,
+library versions and settings so runs can be diffed.
+'''
+import argparse, json, os, platform, resource, subprocess, sys, tempfile, time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from evalset import load_clips
+import metrics
+import ml
+from ml import (FLIP_MODE, FRAME_SAMPLING, GRAPHS_PER_REQUEST, HAND_CROP, LANDMARK_MAX_SIDE, LANDMARK_PROFILE,
+                MOTION_GATE, HolisticPool, actions, model, open_video, predict_sequences, video_to_sequences)
+
+STAGES = ("open", "decode", "downscale", "gate", "crop", "color", "holistic", "keypoints", "normalize", "predict")
+DEFAULT_SYNTHETIC = ["30x480", "90x480", "90x720", "300x720", "90x1080"]
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def add(self, observations):
+        """Takes the (stage, seconds) pairs of metrics.collect_stages()."""
+        for stage, seconds in observations:
+            self.samples[stage].append(seconds)
+
+def synthetic_clip(frames, height, fps=30):
+    """mp4 bytes of `frames` frames at 16:9 with a few moving shapes."""
+    width = height * 16 // 9 // 2 * 2
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.mp4")
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        yy, xx = np.mgrid[0:height, 0:width]
+        background = ((xx * 255 // width)[..., None] * [1, 0, 0] + (yy * 255 // height)[..., None] * [0, 1, 0]).astype(np.uint8)
+        for i in range(frames):
+            frame = background.copy()
+            t = i / max(frames - 1, 1)
+            cv2.circle(frame, (int(width * (0.2 + 0.6 * t)), height // 3), height // 10, (255, 255, 255), -1)
+            cv2.rectangle(frame, (width // 3, int(height * (0.8 - 0.4 * t))),
+                          (width // 3 + height // 8, int(height * (0.8 - 0.4 * t)) + height // 8), (0, 0, 255), -1)
+            out.write(frame)
+        out.release()
+        with open(path, "rb") as f:
+            return f.read()
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def run_clip(video_bytes, pool, timer, seq_len=60, flip_mode=FLIP_MODE):
+    """One pass of video_to_sequences and predict_sequences, the code /predict runs,
+    with its stage observations added to timer; returns the number of frames
+    landmarked (or repeated by the gate)."""
+    with metrics.collect_stages() as stages:
+        seqs = video_to_sequences(video_bytes, seq_len, flip_mode, pool=pool)
+        predict_sequences(seqs, model, actions)
+    timer.add(stages)
+    return sum(stage == "downscale" for stage, _ in stages)
+
+def _pcts(samples):
+    ms = np.array(samples) * 1000.0
+    return {"n": int(ms.size), "p50": float(np.percentile(ms, 50)), "p95": float(np.percentile(ms, 95)),
+            "p99": float(np.percentile(ms, 99)), "total_ms": float(ms.sum())}
+
+def bench(clips, repeat):
+    pool = HolisticPool(GRAPHS_PER_REQUEST)
+    run_clip(clips[0][1], pool, StageTimer())  # graph and model warm-up
+    overall, report = StageTimer(), []
+    for name, video_bytes in clips:
+        timer, clip_times, frames = StageTimer(), [], 0
+        peak_before = _peak_rss_mb()
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            frames = run_clip(video_bytes, pool, timer)
+            clip_times.append(time.perf_counter() - t0)
+        for stage, samples in timer.samples.items():
+            overall.samples[stage] += samples
+        with open_video(video_bytes) as cap:
+            w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        report.append({
+            "clip": name,
+            "resolution": f"{w}x{h}",
+            "frames": total_frames,
+            "frames_landmarked": frames,
+            "stages": {s: _pcts(timer.samples[s]) for s in STAGES if timer.samples[s]},
+            "clip_ms": _pcts(clip_times),
+            "fps": frames / float(np.median(clip_times)),
+            "rss_mb": _rss_mb(),
+            "peak_rss_growth_mb": _peak_rss_mb() - peak_before,
+        })
+    return report, {s: _pcts(overall.samples[s]) for s in STAGES if overall.samples[s]}
+
+def _meta(repeat):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    import mediapipe, tensorflow
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "mediapipe": mediapipe.__version__,
+        "tensorflow": tensorflow.__version__,
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "peak_rss_mb": _peak_rss_mb(),
+        "settings": {
+            "FRAME_SAMPLING": FRAME_SAMPLING,
+            "LANDMARK_MAX_SIDE": LANDMARK_MAX_SIDE,
+            "LANDMARK_PROFILE": LANDMARK_PROFILE,
+            "HAND_CROP": HAND_CROP,
+            "MOTION_GATE": MOTION_GATE,
+            "FLIP_MODE": FLIP_MODE,
+            "INFERENCE_ENGINE": ml.INFERENCE_ENGINE,
+        },
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-samples", action="store_true")
+    ap.add_argument("--synthetic", nargs="*", default=DEFAULT_SYNTHETIC, metavar="FRAMESxHEIGHT")
+    ap.add_argument("--json")
+    args = ap.parse_args()
+
+    clips = [] if args.no_samples else [(name, b) for name, b, _ in load_clips(args.paths, actions)]
+    for spec in args.synthetic:
+        n, h = map(int, spec.lower().split("x"))
+        clips.append((f"synthetic {n}f {h}p", synthetic_clip(n, h)))
+    if not clips:
+        sys.exit("no clips to run")
+
+    report, stages = bench(clips, args.repeat)
+
+    print(f"{len(clips)} clips, {args.repeat} runs each")
+    print(f"{'stage':<12}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'share':>8}")
+    total = sum(s["total_ms"] for s in stages.values())
+    for stage, s in stages.items():
+        print(f"{stage:<12}{s['n']:>7}{s['p50']:>9.2f}{s['p95']:>9.2f}{s['p99']:>9.2f}{s['total_ms'] / total:>8.1%}")
+    print(f"\n{'clip':<36}{'res':>11}{'frames':>8}{'p50 ms':>9}{'fps':>7}{'RSS MB':>8}{'+peak MB':>10}")
+    for r in report:
+        print(f"{r['clip'][:35]:<36}{r['resolution']:>11}{r['frames_landmarked']:>8}"
+              f"{r['clip_ms']['p50']:>9.1f}{r['fps']:>7.1f}{r['rss_mb']:>8.0f}{r['peak_rss_growth_mb']:>10.0f}")
+    print(f"process peak RSS: {_peak_rss_mb():.0f} MB")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": _meta(args.repeat), "stages": stages, "clips": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
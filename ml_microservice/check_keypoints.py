@@ -0,0 +1,87 @@
+'''
+Golden check for keypoints.py: runs Holistic over recorded clips and compares the
+vectorized KeypointBuffer output with the original per-frame extract_keypoints
+(kept verbatim below) bit for bit.
+
+    python check_keypoints.py [clip.mp4 ...]
+
+Without arguments it runs on the clips in Text-to-Sign/Samples.
+'''
+import sys, glob
+from pathlib import Path
+
+import cv2, numpy as np, mediapipe as mp
+
+from keypoints import KeypointBuffer
+
+SAMPLES = Path(__file__).resolve().parent.parent / "Text-to-Sign" / "Samples"
+mp_holistic = mp.solutions.holistic
+
+# ---- reference: per-frame extraction as it was in ml.py ----
+def _safe_xy(lmk):
+    return (getattr(lmk, 'x', 0.0), getattr(lmk, 'y', 0.0))
+
+def reference_extract_keypoints(results):
+    POSE_NOSE, POSE_LEFT_EYE_OUTER, POSE_RIGHT_EYE_OUTER = 0, 3, 6
+    if results.pose_landmarks:
+        pose_lm = results.pose_landmarks.landmark
+        le_x, le_y = _safe_xy(pose_lm[POSE_LEFT_EYE_OUTER])
+        re_x, re_y = _safe_xy(pose_lm[POSE_RIGHT_EYE_OUTER])
+        nose_x, nose_y = _safe_xy(pose_lm[POSE_NOSE])
+        fc_x = (le_x + re_x)/2.0 if (le_x or re_x) else nose_x
+        fc_y = (le_y + re_y)/2.0 if (le_y or re_y) else nose_y
+        face_scale = np.hypot(le_x - re_x, le_y - re_y) or 1e-3
+    else:
+        pose_lm = []
+        fc_x = fc_y = 0.0
+        face_scale = 1e-3
+
+    def norm_xy(arr):
+        arr = arr.copy()
+        arr[:,0] = (arr[:,0] - fc_x) / face_scale
+        arr[:,1] = (arr[:,1] - fc_y) / face_scale
+        return arr
+
+    if results.pose_landmarks:
+        pose_xyz = np.array([[l.x, l.y, l.z] for l in results.pose_landmarks.landmark], dtype=np.float32)
+        pose_xyz = norm_xy(pose_xyz)
+        pose_vis = np.array([[l.visibility] for l in results.pose_landmarks.landmark], dtype=np.float32)
+        pose = np.concatenate([pose_xyz, pose_vis], axis=1).flatten()
+    else:
+        pose = np.zeros(33*4, dtype=np.float32)
+
+    lh_raw = np.array([[l.x, l.y, l.z] for l in results.left_hand_landmarks.landmark], dtype=np.float32) if results.left_hand_landmarks else np.zeros((21,3), dtype=np.float32)
+    rh_raw = np.array([[l.x, l.y, l.z] for l in results.right_hand_landmarks.landmark], dtype=np.float32) if results.right_hand_landmarks else np.zeros((21,3), dtype=np.float32)
+
+    lh = norm_xy(lh_raw).flatten()
+    rh = norm_xy(rh_raw).flatten()
+    return np.concatenate([pose, lh, rh]).astype(np.float32)
+
+def check_clip(path):
+    ref, buf = [], KeypointBuffer(int(1e4))
+    cap = cv2.VideoCapture(str(path))
+    with mp_holistic.Holistic(static_image_mode=False, model_complexity=1,
+                              smooth_landmarks=True, refine_face_landmarks=False) as hol:
+        while True:
+            ret, frame = cap.read()
+            if not ret or len(buf) >= buf.capacity:
+                break
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            results = hol.process(image)
+            ref.append(reference_extract_keypoints(results))
+            buf.append(results)
+    cap.release()
+
+    ref = np.stack(ref) if ref else np.zeros((0, 258), dtype=np.float32)
+    got = buf.keypoints()
+    same = ref.shape == got.shape and np.array_equal(ref.view(np.uint32), got.view(np.uint32))
+    print(f"{Path(path).name}: {len(ref)} frames {'OK' if same else 'MISMATCH'}")
+    return same
+
+def main(paths):
+    paths = paths or sorted(glob.glob(str(SAMPLES / "*.mp4")))
+    return 0 if all([check_clip(p) for p in paths]) else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
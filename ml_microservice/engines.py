@@ -0,0 +1,88 @@
+'''
+CPU inference engines for the sign LSTM. Every engine has the Keras model's
+predict(X, verbose=0) -> (n, classes) signature, so MicroBatcher and
+predict_sequences work with any of them.
+
+  keras            the .h5 model through model.predict (reference)
+  compiled         SavedModel of an XLA-compiled tf.function with a fixed
+                   (None, 60, 258) float32 signature
+  tflite-fp32      TFLite flatbuffer (batch 1, builtin ops only)
+  tflite-float16   ... with float16 weights
+  tflite-dynamic   ... with int8 weights, float activations
+  tflite-int8      ... fully int8 (calibrated on recorded keypoint sequences)
+
+Artifacts other than keras are produced by export_engine.py into ENGINE_DIR.
+'''
+import os, threading
+
+import numpy as np
+import tensorflow as tf
+
+from keypoints import FEATURE_DIM
+
+SEQ_LEN = 60
+COMPILED_DIR = "compiled"
+TFLITE_VARIANTS = ("fp32", "float16", "dynamic", "int8")
+ENGINES = ("keras", "compiled") + tuple(f"tflite-{v}" for v in TFLITE_VARIANTS)
+
+def tflite_path(engine_dir, variant):
+    return os.path.join(engine_dir, f"model_{variant}.tflite")
+
+def serving_function(model, jit_compile=True, batch=None):
+    """The model's forward pass as a tf.function with a fixed input signature, so it is
+    traced once instead of going through Keras' generic predict loop per call."""
+    @tf.function(input_signature=[tf.TensorSpec([batch, SEQ_LEN, FEATURE_DIM], tf.float32)],
+                 jit_compile=jit_compile)
+    def predict(x):
+        return model(x, training=False)
+    return predict
+
+class CompiledEngine:
+    def __init__(self, path):
+        self._loaded = tf.saved_model.load(path)
+        self._fn = self._loaded.predict
+
+    def predict(self, X, verbose=0):
+        X = np.asarray(X, dtype=np.float32)
+        return self._fn(tf.constant(X)).numpy()
+
+class TFLiteEngine:
+    """A TFLite interpreter is not thread-safe, so calls are serialized (MicroBatcher
+    already funnels them through one thread). Models exported with a dynamic batch
+    dimension are resized per batch; fixed-batch ones are invoked row by row."""
+
+    def __init__(self, path, num_threads=None):
+        self._interp = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        self._lock = threading.Lock()
+        self._in = self._interp.get_input_details()[0]
+        self._out = self._interp.get_output_details()[0]
+        sig = self._in.get("shape_signature", self._in["shape"])
+        self._resizable = len(sig) > 0 and sig[0] == -1
+        self._batch = int(self._in["shape"][0])
+        self._interp.allocate_tensors()
+
+    def _invoke(self, X):
+        if self._batch != len(X):
+            self._interp.resize_tensor_input(self._in["index"], X.shape)
+            self._interp.allocate_tensors()
+            self._batch = len(X)
+        self._interp.set_tensor(self._in["index"], X)
+        self._interp.invoke()
+        return self._interp.get_tensor(self._out["index"]).copy()
+
+    def predict(self, X, verbose=0):
+        X = np.asarray(X, dtype=np.float32)
+        with self._lock:
+            if self._resizable:
+                return self._invoke(X)
+            return np.concatenate([self._invoke(X[i:i + 1]) for i in range(len(X))], axis=0)
+
+def load_engine(name, model_path, engine_dir="compiled_engines", num_threads=None):
+    if name == "keras":
+        return tf.keras.models.load_model(model_path)
+    if name == "compiled":
+        return CompiledEngine(os.path.join(engine_dir, COMPILED_DIR))
+    variant = name.partition("-")[2]
+    if name.startswith("tflite-") and variant in TFLITE_VARIANTS:
+        return TFLiteEngine(tflite_path(engine_dir, variant), num_threads=num_threads)
+    raise ValueError(f"unknown inference engine {name!r}, expected one of {', '.join(ENGINES)}")
@@ -0,0 +1,102 @@
+'''
+Latency / accuracy of the landmarking profiles in ml.py (LANDMARK_PROFILES),
+to pick one per deployment tier.
+
+    python eval_profiles.py [--repeat N] [--profiles accurate fast ...] [--json out.json] [clip_or_dir ...]
+
+Every profile runs the full decode + Holistic + LSTM path on each held-out clip
+with its own Holistic graph. Reported per profile: Holistic time per frame,
+end-to-end time per clip, top-1 agreement with "accurate" and accuracy on the
+clips with a known label (see evalset.py).
+'''
+import argparse, json, time
+from functools import partial
+
+import numpy as np
+
+from evalset import load_clips
+from ml import (FLIP_MODE, GRAPHS_PER_REQUEST, LANDMARK_PROFILES, HolisticPool, _holistic, actions, model,
+                predict_sequences, video_to_sequences)
+
+class TimedHolistic:
+    """Holistic graph that records the duration of every process() call."""
+
+    def __init__(self, hol, samples):
+        self._hol = hol
+        self._samples = samples
+
+    def process(self, image):
+        t0 = time.perf_counter()
+        results = self._hol.process(image)
+        self._samples.append(time.perf_counter() - t0)
+        return results
+
+    def reset(self):
+        self._hol.reset()
+
+    def close(self):
+        self._hol.close()
+
+def _ms(samples):
+    ms = np.array(samples) * 1000.0
+    return {"mean": float(ms.mean()), "p50": float(np.percentile(ms, 50)), "p95": float(np.percentile(ms, 95))}
+
+def run(clips, profiles, repeat):
+    report, baseline = [], None
+    for profile in profiles:
+        frame_times = []
+        pool = HolisticPool(GRAPHS_PER_REQUEST, factory=lambda: TimedHolistic(_holistic(profile), frame_times))
+        run_clip = partial(video_to_sequences, seq_len=60, flip_mode=FLIP_MODE, pool=pool,
+                           hand_crop=LANDMARK_PROFILES[profile]["hand_crop"])
+        run_clip(clips[0][1])  # graph warm-up
+        frame_times.clear()
+
+        lat, preds, hits, labelled = [], [], 0, 0
+        for clip_name, video_bytes, label in clips:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                seq, fseq = run_clip(video_bytes)
+                _, conf, probs = predict_sequences((seq, fseq), model, actions)
+                lat.append(time.perf_counter() - t0)
+            top1 = actions[int(np.argmax(probs))] if probs is not None else None
+            preds.append(top1)
+            if label:
+                labelled += 1
+                hits += top1 == label
+
+        baseline = baseline or preds
+        report.append({
+            "profile": profile,
+            **LANDMARK_PROFILES[profile],
+            "frame_ms": _ms(frame_times),
+            "clip_ms": _ms(lat),
+            "agreement_with_first": float(np.mean([a == b for a, b in zip(preds, baseline)])),
+            "accuracy": hits / labelled if labelled else None,
+            "labelled_clips": labelled,
+        })
+    return report
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*")
+    ap.add_argument("--profiles", nargs="*", default=list(LANDMARK_PROFILES), choices=list(LANDMARK_PROFILES))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json")
+    args = ap.parse_args()
+
+    clips = load_clips(args.paths, actions)
+    report = run(clips, args.profiles, args.repeat)
+
+    print(f"{len(clips)} clips, {args.repeat} runs each, agreement against {args.profiles[0]!r}")
+    print(f"{'profile':<12}{'frame p50':>11}{'frame p95':>11}{'clip mean':>11}{'clip p95':>10}{'agree':>8}{'acc':>8}")
+    for r in report:
+        acc = f"{r['accuracy']:.2f}" if r["accuracy"] is not None else "-"
+        print(f"{r['profile']:<12}{r['frame_ms']['p50']:>11.1f}{r['frame_ms']['p95']:>11.1f}"
+              f"{r['clip_ms']['mean']:>11.1f}{r['clip_ms']['p95']:>10.1f}"
+              f"{r['agreement_with_first']:>8.2f}{acc:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
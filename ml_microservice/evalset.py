@@ -0,0 +1,34 @@
+'''
+Recorded clip sets for the offline benchmarks and evaluations in this folder.
+
+A path can be a clip or a directory searched recursively. The label of a clip is
+its parent directory when that is an action id ("0088/clip.mp4", the KArSL
+layout), otherwise the first number in its file name ("Sign 88 (Heart).mp4").
+Clips whose label is not one of the model's actions are kept, unlabelled.
+'''
+import re
+from pathlib import Path
+
+SAMPLES = Path(__file__).resolve().parent.parent / "Text-to-Sign" / "Samples"
+VIDEO_EXTS = {".mp4", ".mov", ".webm", ".avi", ".mkv"}
+
+def label_for(path, actions):
+    path = Path(path)
+    if path.parent.name in actions:
+        return path.parent.name
+    m = re.search(r"\d+", path.stem)
+    if m:
+        action = m.group(0).zfill(4)
+        if action in actions:
+            return action
+    return None
+
+def load_clips(paths, actions):
+    """[(name, video_bytes, label or None), ...] for every clip under paths (default: Samples)."""
+    files = []
+    for p in map(Path, paths or [SAMPLES]):
+        if p.is_dir():
+            files += sorted(f for f in p.rglob("*") if f.suffix.lower() in VIDEO_EXTS)
+        else:
+            files.append(p)
+    return [(f.name, f.read_bytes(), label_for(f, actions)) for f in files]
@@ -0,0 +1,141 @@
+'''
+Builds the optimized CPU engines from the .h5 model (see engines.py) and
+compares them with it.
+
+    python export_engine.py [--out compiled_engines] [--quant fp32 float16 dynamic int8]
+                            [--calib seqs] [--report seqs] [--json report.json]
+
+seqs are recorded keypoint sequences: a .npy of shape (N, 60, 258), or a
+directory of .npz entries as written by the ML service's CACHE_DIR. int8 needs
+--calib, and is not exported by default: with Keras 3 the LSTMs convert to a
+WHILE loop over resource variables, which the TF 2.19 calibrator crashes on. --report times every engine at batch 1 and 8, measures its RSS growth
+on load and artifact size, and checks top-1 agreement with the .h5 model.
+'''
+import argparse, glob, json, os, tempfile, time
+
+import numpy as np
+import tensorflow as tf
+
+from engines import COMPILED_DIR, ENGINES, TFLITE_VARIANTS, load_engine, serving_function, tflite_path
+
+DEFAULT_MODEL = "Model - 93.32% Training Acc - 94.16% Testing Acc.h5"
+
+def load_sequences(path):
+    if os.path.isdir(path):
+        seqs = []
+        for f in sorted(glob.glob(os.path.join(path, "**", "*.npz"), recursive=True)):
+            with np.load(f) as entry:
+                seqs += [entry[k] for k in ("seq", "fseq") if k in entry.files]
+        return np.stack(seqs).astype(np.float32)
+    return np.load(path).astype(np.float32)
+
+def _archive(model, path, fn):
+    # ExportArchive tracks every variable the model's call touches (incl. RNG state)
+    archive = tf.keras.export.ExportArchive()
+    archive.track(model)
+    archive.add_endpoint("predict", fn)
+    archive.write_out(path)
+
+def export_compiled(model, out_dir):
+    _archive(model, os.path.join(out_dir, COMPILED_DIR), serving_function(model))
+
+def export_tflite(model, out_dir, variant, calib=None):
+    # a batch-1 signature keeps the LSTMs on builtin WHILE ops; a dynamic batch
+    # lowers them to TensorList ops that need the Flex delegate at runtime
+    with tempfile.TemporaryDirectory() as tmp:
+        _archive(model, tmp, serving_function(model, jit_compile=False, batch=1))
+        converter = tf.lite.TFLiteConverter.from_saved_model(tmp)
+        if variant != "fp32":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if variant == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        if variant == "int8":
+            if calib is None:
+                raise SystemExit("int8 export needs --calib sequences")
+            def representative():
+                for x in calib[:500]:
+                    yield [x[None]]
+            converter.representative_dataset = representative
+        flat = converter.convert()
+    with open(tflite_path(out_dir, variant), "wb") as f:
+        f.write(flat)
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def _artifact_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(path) for f in fs) / 2**20
+    return os.path.getsize(path) / 2**20
+
+def _latency_ms(engine, X, runs):
+    engine.predict(X, verbose=0)  # warm-up / tracing
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        engine.predict(X, verbose=0)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {"p50": float(np.percentile(times, 50)), "p95": float(np.percentile(times, 95))}
+
+def report(model_path, out_dir, seqs, runs=50):
+    rows, reference = [], None
+    for name in ENGINES:
+        path = (model_path if name == "keras" else os.path.join(out_dir, COMPILED_DIR) if name == "compiled"
+                else tflite_path(out_dir, name.partition("-")[2]))
+        if not os.path.exists(path):
+            continue
+        rss0 = _rss_mb()
+        engine = load_engine(name, model_path, out_dir)
+        rss = _rss_mb() - rss0
+
+        probs = np.concatenate([engine.predict(seqs[i:i + 64], verbose=0) for i in range(0, len(seqs), 64)])
+        if reference is None:
+            reference = probs
+        rows.append({
+            "engine": name,
+            "artifact_mb": _artifact_mb(path),
+            "rss_growth_mb": rss,
+            "batch1_ms": _latency_ms(engine, seqs[:1], runs),
+            "batch8_ms": _latency_ms(engine, seqs[:8], runs),
+            "top1_agreement": float(np.mean(probs.argmax(1) == reference.argmax(1))),
+            "max_abs_prob_diff": float(np.abs(probs - reference).max()),
+        })
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--out", default="compiled_engines")
+    ap.add_argument("--quant", nargs="*", default=["fp32", "float16", "dynamic"], choices=TFLITE_VARIANTS)
+    ap.add_argument("--no-compiled", action="store_true")
+    ap.add_argument("--calib")
+    ap.add_argument("--report")
+    ap.add_argument("--json")
+    args = ap.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    model = tf.keras.models.load_model(args.model)
+    calib = load_sequences(args.calib) if args.calib else None
+    if not args.no_compiled:
+        export_compiled(model, args.out)
+        print("exported", os.path.join(args.out, COMPILED_DIR))
+    for variant in args.quant:
+        export_tflite(model, args.out, variant, calib)
+        print("exported", tflite_path(args.out, variant))
+
+    if args.report:
+        seqs = load_sequences(args.report)
+        rows = report(args.model, args.out, seqs)
+        print(f"\n{len(seqs)} sequences")
+        print(f"{'engine':<16}{'MB':>7}{'RSS MB':>8}{'b1 p50':>8}{'b1 p95':>8}{'b8 p50':>8}{'top1':>7}")
+        for r in rows:
+            print(f"{r['engine']:<16}{r['artifact_mb']:>7.2f}{r['rss_growth_mb']:>8.1f}"
+                  f"{r['batch1_ms']['p50']:>8.2f}{r['batch1_ms']['p95']:>8.2f}"
+                  f"{r['batch8_ms']['p50']:>8.2f}{r['top1_agreement']:>7.3f}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+'''
+Compares the single-pass "mirror" flip mode against the legacy "reflip" mode
+(second decode + Holistic on cv2.flip'ed frames) on recorded clips.
+
+    python flip_parity.py [--max-dp 0.05] [--max-dconf 0.05] [clip_or_dir ...]
+
+Without arguments it runs on the clips in Text-to-Sign/Samples (see evalset.py).
+Per clip it prints both answers, the largest probability difference max|dp| and
+the confidence drift; at the end the mean/max drift and, on clips with a known
+label, the accuracy of each mode. Exits non-zero if any clip changes its top-1
+word, its answer (label_probs turns a confidence under 0.3 into "unknown") or
+drifts past --max-dp / --max-dconf. "mirror" should only become the default
+FLIP_MODE once this passes on a labelled set.
+'''
+import argparse, sys, time
+from pathlib import Path
+
+import numpy as np
+
+from evalset import load_clips
+from ml import actions, model, predict_from_bytes
+
+def compare(video_bytes):
+    out = {}
+    for mode in ("reflip", "mirror"):
+        t0 = time.perf_counter()
+        word, conf, probs = predict_from_bytes(video_bytes, model, actions, flip_mode=mode)
+        out[mode] = (word, conf, probs, time.perf_counter() - t0)
+    return out["reflip"], out["mirror"]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-dp", type=float, default=0.05, help="largest allowed per-class probability difference")
+    ap.add_argument("--max-dconf", type=float, default=0.05, help="largest allowed top-1 confidence difference")
+    ap.add_argument("paths", nargs="*")
+    args = ap.parse_args()
+
+    clips = load_clips(args.paths, actions)
+    failures, dps, dconfs = 0, [], []
+    hits = {"reflip": 0, "mirror": 0}
+    labelled = 0
+    for name, video_bytes, label in clips:
+        (w_ref, c_ref, p_ref, t_ref), (w_mir, c_mir, p_mir, t_mir) = compare(video_bytes)
+        top_ref = int(np.argmax(p_ref)) if p_ref is not None else None
+        top_mir = int(np.argmax(p_mir)) if p_mir is not None else None
+        dp = float(np.abs(p_ref - p_mir).max()) if p_ref is not None and p_mir is not None else 0.0
+        dconf = abs(c_ref - c_mir)
+        dps.append(dp)
+        dconfs.append(dconf)
+
+        problems = []
+        if top_ref != top_mir:
+            problems.append("top-1")
+        if w_ref != w_mir:
+            problems.append("answer")
+        if dp > args.max_dp:
+            problems.append("max|dp|")
+        if dconf > args.max_dconf:
+            problems.append("confidence")
+        failures += bool(problems)
+        if label:
+            labelled += 1
+            hits["reflip"] += w_ref == label
+            hits["mirror"] += w_mir == label
+
+        print(f"{Path(name).name}: reflip={w_ref} ({c_ref:.3f}, {t_ref*1000:.0f} ms) "
+              f"mirror={w_mir} ({c_mir:.3f}, {t_mir*1000:.0f} ms) "
+              f"max|dp|={dp:.4f} dconf={dconf:.4f} "
+              f"{'OK' if not problems else 'FAIL (' + ', '.join(problems) + ')'}")
+
+    if dps:
+        print(f"drift over {len(clips)} clips: max|dp| mean={np.mean(dps):.4f} max={max(dps):.4f}, "
+              f"dconf mean={np.mean(dconfs):.4f} max={max(dconfs):.4f} "
+              f"(tolerance {args.max_dp} / {args.max_dconf})")
+    if labelled:
+        print(f"accuracy on {labelled} labelled clips: reflip={hits['reflip'] / labelled:.3f} "
+              f"mirror={hits['mirror'] / labelled:.3f}")
+    else:
+        print("no labelled clips: agreement only, not enough to switch FLIP_MODE")
+    print(f"{failures}/{len(clips)} clips outside tolerance")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+'''
+Holistic landmarks -> (T, 258) keypoint sequences, shared by ml.py and the training notebook.
+
+Per frame the feature vector is 33 pose landmarks (x, y, z, visibility) followed by the
+left and right hand (21 landmarks x, y, z each). x/y are normalized around the face
+centre (midpoint of the outer eye corners) and scaled by the distance between them.
+
+Landmarks are pulled out of the MediaPipe protos in bulk into a preallocated
+KeypointBuffer, and the whole sequence is normalized in one vectorized step.
+The output is bit for bit what the old per-frame extract_keypoints returned
+under numpy 2 (see check_keypoints.py).
+
+Clients that run MediaPipe on-device send the raw landmarks instead of video, as
+a landmark payload (encode_landmarks / decode_landmarks): a 12-byte header
+(b"QSKP", version, bytes per value, features, frames; little-endian) followed by
+a (frames, 258) float16 or float32 array in the feature layout above, before
+normalization, with missing parts as zeros.
+'''
+import struct
+from itertools import chain
+from operator import attrgetter
+
+import numpy as np
+
+POSE_N, HAND_N = 33, 21
+POSE_DIM, HAND_DIM = POSE_N*4, HAND_N*3
+FEATURE_DIM = POSE_DIM + 2*HAND_DIM  # 258
+
+POSE_NOSE, POSE_LEFT_EYE_OUTER, POSE_RIGHT_EYE_OUTER = 0, 3, 6
+NO_POSE_SCALE = 1e-3  # face scale used when there is no pose (or the eyes coincide)
+
+# pose landmark order after a horizontal flip (left/right body parts swap)
+POSE_MIRROR = [0, 4, 5, 6, 1, 2, 3, 8, 7, 10, 9, 12, 11, 14, 13, 16, 15,
+               18, 17, 20, 19, 22, 21, 24, 23, 26, 25, 28, 27, 30, 29, 32, 31]
+
+PAYLOAD_MAGIC, PAYLOAD_VERSION = b"QSKP", 1
+_PAYLOAD_HEADER = struct.Struct("<4sBBHI")
+_PAYLOAD_DTYPES = {2: np.dtype("<f2"), 4: np.dtype("<f4")}
+
+_XYZ = attrgetter('x', 'y', 'z')
+_XYZV = attrgetter('x', 'y', 'z', 'visibility')
+
+def _fill(dst, lmk_list, getter):
+    # one C-level pass over the repeated field instead of a list per landmark
+    dst[:] = np.fromiter(chain.from_iterable(map(getter, lmk_list.landmark)),
+                         dtype=np.float64, count=dst.size).reshape(dst.shape)
+
+class KeypointBuffer:
+    """Raw landmarks of up to `capacity` frames, kept as float64 (the protos' Python
+    floats) so normalization can reproduce the per-frame arithmetic exactly.
+    Missing parts are all-zero rows with their has_* flag cleared."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.pose = np.zeros((capacity, POSE_N, 4), dtype=np.float64)
+        self.lh = np.zeros((capacity, HAND_N, 3), dtype=np.float64)
+        self.rh = np.zeros((capacity, HAND_N, 3), dtype=np.float64)
+        self.has_pose = np.zeros(capacity, dtype=bool)
+        self.has_lh = np.zeros(capacity, dtype=bool)
+        self.has_rh = np.zeros(capacity, dtype=bool)
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    @classmethod
+    def from_raw(cls, raw):
+        """Buffer holding (T, 258) raw landmark rows (a decoded landmark payload);
+        a part whose values are all zero counts as not detected."""
+        raw = np.asarray(raw, dtype=np.float64)
+        buf = cls(len(raw))
+        buf.pose[:] = raw[:, :POSE_DIM].reshape(-1, POSE_N, 4)
+        buf.lh[:] = raw[:, POSE_DIM:POSE_DIM + HAND_DIM].reshape(-1, HAND_N, 3)
+        buf.rh[:] = raw[:, POSE_DIM + HAND_DIM:].reshape(-1, HAND_N, 3)
+        for part, has in ((buf.pose, buf.has_pose), (buf.lh, buf.has_lh), (buf.rh, buf.has_rh)):
+            has[:] = part.reshape(len(raw), -1).any(axis=1)
+        buf.n = len(raw)
+        return buf
+
+    def raw_landmarks(self):
+        """(n, 258) raw landmark rows, the inverse of from_raw."""
+        return np.concatenate([self.pose[:self.n].reshape(self.n, -1), self.lh[:self.n].reshape(self.n, -1),
+                               self.rh[:self.n].reshape(self.n, -1)], axis=1)
+
+    def drop_oldest(self, k):
+        """Forgets the first k frames, for rolling use over open-ended streams."""
+        k = min(k, self.n)
+        for arr in (self.pose, self.lh, self.rh, self.has_pose, self.has_lh, self.has_rh):
+            arr[:self.n - k] = arr[k:self.n]
+        self.n -= k
+
+    def repeat_last(self):
+        """Duplicates the previous frame, for frames skipped as near-duplicates."""
+        if not 0 < self.n < self.capacity:
+            raise IndexError("KeypointBuffer is empty or full")
+        i = self.n
+        for arr in (self.pose, self.lh, self.rh, self.has_pose, self.has_lh, self.has_rh):
+            arr[i] = arr[i - 1]
+        self.n += 1
+
+    def append(self, results, roi=None):
+        """Adds one frame's Holistic results. roi=(x0, y0, w, h) says they were computed
+        on that crop of the frame (normalized frame coordinates); the landmarks are then
+        mapped back to full-frame coordinates (z is scaled like x, by image width)."""
+        if self.n >= self.capacity:
+            raise IndexError("KeypointBuffer is full")
+        i = self.n
+        for lmks, raw, has, getter in (
+            (results.pose_landmarks, self.pose, self.has_pose, _XYZV),
+            (results.left_hand_landmarks, self.lh, self.has_lh, _XYZ),
+            (results.right_hand_landmarks, self.rh, self.has_rh, _XYZ),
+        ):
+            if lmks:
+                _fill(raw[i], lmks, getter)
+                has[i] = True
+                if roi is not None:
+                    x0, y0, w, h = roi
+                    raw[i, :, 0] = x0 + raw[i, :, 0] * w
+                    raw[i, :, 1] = y0 + raw[i, :, 1] * h
+                    raw[i, :, 2] *= w
+            else:
+                raw[i] = 0
+                has[i] = False
+        self.n += 1
+
+    def keypoints(self, mirror=False, out=None):
+        """(n, 258) float32 keypoints; with mirror=True, those of the horizontally flipped clip."""
+        sl = slice(0, self.n)
+        pose, lh, rh = self.pose[sl], self.lh[sl], self.rh[sl]
+        has_pose, has_lh, has_rh = self.has_pose[sl], self.has_lh[sl], self.has_rh[sl]
+        if mirror:
+            pose, lh, rh, has_pose, has_lh, has_rh = mirror_landmarks(pose, lh, rh, has_pose, has_lh, has_rh)
+        return normalize_sequence(pose, lh, rh, has_pose, out=out)
+
+def mirror_landmarks(pose, lh, rh, has_pose, has_lh, has_rh):
+    """Raw landmarks as Holistic would report them on the cv2.flip'ed frames:
+    x -> 1 - x, left/right pose points swapped and the two hands exchanged."""
+    def flip(raw, has):
+        raw = raw.copy()
+        raw[..., 0] = np.where(has[:, None], 1.0 - raw[..., 0], 0.0)
+        return raw
+    return (flip(pose[:, POSE_MIRROR], has_pose), flip(rh, has_rh), flip(lh, has_lh),
+            has_pose, has_rh, has_lh)
+
+def normalize_sequence(pose, lh, rh, has_pose, out=None):
+    """Raw (T, 33, 4) pose and (T, 21, 3) hands -> (T, 258) float32 keypoints.
+
+    Matches the per-frame code's dtypes: the face centre is computed in float64 and
+    subtracted in float32; the float64 face scale promotes the division to float64,
+    while the NO_POSE_SCALE fallback (a Python float) keeps it in float32.
+    """
+    T = pose.shape[0]
+    if out is None:
+        out = np.empty((T, FEATURE_DIM), dtype=np.float32)
+
+    le = pose[:, POSE_LEFT_EYE_OUTER, :2]
+    re = pose[:, POSE_RIGHT_EYE_OUTER, :2]
+    nose = pose[:, POSE_NOSE, :2]
+    fc = np.where((le != 0) | (re != 0), (le + re) / 2.0, nose)
+    fc[~has_pose] = 0.0
+    scale = np.hypot(le[:, 0] - re[:, 0], le[:, 1] - re[:, 1])
+    weak = ~has_pose | (scale == 0)
+
+    xyz = np.concatenate([pose[:, :, :3], lh, rh], axis=1).astype(np.float32)  # (T, 75, 3)
+    d = xyz[:, :, :2] - fc.astype(np.float32)[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        strong = (d / scale[:, None, None]).astype(np.float32)
+    xyz[:, :, :2] = np.where(weak[:, None, None], d / np.float32(NO_POSE_SCALE), strong)
+
+    out_pose = out[:, :POSE_DIM].reshape(T, POSE_N, 4)
+    out_pose[:, :, :3] = xyz[:, :POSE_N]
+    out_pose[:, :, 3] = pose[:, :, 3]
+    out_pose[~has_pose] = 0.0
+    out[:, POSE_DIM:] = xyz[:, POSE_N:].reshape(T, 2*HAND_DIM)
+    return out
+
+def encode_landmarks(raw, dtype=np.float16):
+    """Landmark payload for (T, 258) raw landmark rows."""
+    arr = np.ascontiguousarray(raw, dtype=np.dtype(dtype).newbyteorder("<"))
+    if arr.ndim != 2 or arr.shape[1] != FEATURE_DIM or arr.itemsize not in _PAYLOAD_DTYPES:
+        raise ValueError(f"expected (T, {FEATURE_DIM}) float16/float32 landmarks, got {arr.shape} {arr.dtype}")
+    return _PAYLOAD_HEADER.pack(PAYLOAD_MAGIC, PAYLOAD_VERSION, arr.itemsize, FEATURE_DIM, len(arr)) + arr.tobytes()
+
+def decode_landmarks(payload, max_frames=None):
+    """(T, 258) float32 raw landmark rows from a landmark payload; ValueError if malformed."""
+    if len(payload) < _PAYLOAD_HEADER.size:
+        raise ValueError("landmark payload too short")
+    magic, version, itemsize, features, frames = _PAYLOAD_HEADER.unpack_from(payload)
+    if magic != PAYLOAD_MAGIC or version != PAYLOAD_VERSION:
+        raise ValueError("not a landmark payload (bad magic or version)")
+    if itemsize not in _PAYLOAD_DTYPES or features != FEATURE_DIM:
+        raise ValueError(f"unsupported landmark layout: {itemsize}-byte values, {features} features")
+    if not frames or (max_frames and frames > max_frames):
+        raise ValueError(f"landmark payload has {frames} frames, expected 1 to {max_frames or 'any'}")
+    if len(payload) != _PAYLOAD_HEADER.size + frames * features * itemsize:
+        raise ValueError("landmark payload size does not match its header")
+    arr = np.frombuffer(payload, dtype=_PAYLOAD_DTYPES[itemsize], offset=_PAYLOAD_HEADER.size)
+    arr = arr.reshape(frames, features).astype(np.float32)
+    if not np.isfinite(arr).all():
+        raise ValueError("landmark payload contains NaN or inf")
+    return arr
+
+def sample_indices(n, L):
+    """L frame indices spread uniformly over an n-frame clip (training's sampling);
+    clips shorter than L repeat their last frame."""
+    if n <= 0:
+        return []
+    if n >= L:
+        return list(np.linspace(0, n-1, L).astype(int))
+    idx = list(range(n))
+    idx += [n-1] * (L - n)
+    return idx
+
+def extract_keypoints(results):
+    """Per-frame (258,) keypoints, kept for live/webcam loops."""
+    buf = KeypointBuffer(1)
+    buf.append(results)
+    return buf.keypoints()[0]
@@ -1,10 +1,12 @@
 from flask import Flask, request, jsonify
-from tensorflow.keras.models import load_model
-import cv2, numpy as np, os, tempfile, mediapipe as mp
+import cv2, numpy as np, os, io, tempfile
+import hashlib, json, queue, threading, time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 
-mp_drawing  = mp.solutions.drawing_utils
-mp_holistic = mp.solutions.holistic
-mp_face_mesh = mp.solutions.face_mesh
+import metrics
+from keypoints import FEATURE_DIM, KeypointBuffer, decode_landmarks, sample_indices
 
 actions = [
     '0088','0095','0115','0125','0131','0157','0159','0160','0161','0162',
@@ -12,101 +14,490 @@ actions = [
     '0195','0196','0197','0255','0256','0260','0287','0288','0289','0293'
 ]
 
-# ---- keypoint extraction (unchanged) ----
-def _safe_xy(lmk):
-    return (getattr(lmk, 'x', 0.0), getattr(lmk, 'y', 0.0))
-
-def extract_keypoints(results):
-    POSE_NOSE, POSE_LEFT_EYE_OUTER, POSE_RIGHT_EYE_OUTER = 0, 3, 6
-    if results.pose_landmarks:
-        pose_lm = results.pose_landmarks.landmark
-        le_x, le_y = _safe_xy(pose_lm[POSE_LEFT_EYE_OUTER])
-        re_x, re_y = _safe_xy(pose_lm[POSE_RIGHT_EYE_OUTER])
-        nose_x, nose_y = _safe_xy(pose_lm[POSE_NOSE])
-        fc_x = (le_x + re_x)/2.0 if (le_x or re_x) else nose_x
-        fc_y = (le_y + re_y)/2.0 if (le_y or re_y) else nose_y
-        face_scale = np.hypot(le_x - re_x, le_y - re_y) or 1e-3
-    else:
-        pose_lm = []
-        fc_x = fc_y = 0.0
-        face_scale = 1e-3
-
-    def norm_xy(arr):
-        arr = arr.copy()
-        arr[:,0] = (arr[:,0] - fc_x) / face_scale
-        arr[:,1] = (arr[:,1] - fc_y) / face_scale
-        return arr
-
-    if results.pose_landmarks:
-        pose_xyz = np.array([[l.x, l.y, l.z] for l in results.pose_landmarks.landmark], dtype=np.float32)
-        pose_xyz = norm_xy(pose_xyz)
-        pose_vis = np.array([[l.visibility] for l in results.pose_landmarks.landmark], dtype=np.float32)
-        pose = np.concatenate([pose_xyz, pose_vis], axis=1).flatten()
-    else:
-        pose = np.zeros(33*4, dtype=np.float32)
+# ---- flip test-time augmentation ----
+# "mirror": one Holistic pass, the flipped sequence is derived from the landmarks
+#           (keypoints.mirror_landmarks)
+# "reflip": legacy behaviour, decode + Holistic a second time on cv2.flip'ed frames
+# "reflip" stays the default: "mirror" shifts probabilities enough to change answers
+# on some clips, so switch only once flip_parity.py passes on a labelled set
+FLIP_MODE = os.getenv("FLIP_MODE", "reflip")
 
-    lh_raw = np.array([[l.x, l.y, l.z] for l in results.left_hand_landmarks.landmark], dtype=np.float32) if results.left_hand_landmarks else np.zeros((21,3), dtype=np.float32)
-    rh_raw = np.array([[l.x, l.y, l.z] for l in results.right_hand_landmarks.landmark], dtype=np.float32) if results.right_hand_landmarks else np.zeros((21,3), dtype=np.float32)
+# ---- in-memory video decoding ----
+# only used when this OpenCV build can't decode from a Python stream (< 4.11)
+VIDEO_SPOOL_DIR = os.getenv("VIDEO_SPOOL_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
 
-    lh = norm_xy(lh_raw).flatten()
-    rh = norm_xy(rh_raw).flatten()
-    return np.concatenate([pose, lh, rh]).astype(np.float32)
+def _probe_stream_decoding():
+    """Whether cv2.VideoCapture decodes from a Python stream in this build, found out
+    once by writing a three-frame clip and reading it back through io.BytesIO."""
+    try:
+        from cv2 import videoio_registry
+        if cv2.CAP_FFMPEG not in videoio_registry.getStreamBufferedBackends():
+            return False
+    except (AttributeError, cv2.error):
+        return False
+    with tempfile.TemporaryDirectory(dir=VIDEO_SPOOL_DIR) as tmp:
+        path = os.path.join(tmp, "probe.mp4")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (32, 32))
+        if not writer.isOpened():
+            return False  # can't tell, the spool file always works
+        for _ in range(3):
+            writer.write(np.zeros((32, 32, 3), np.uint8))
+        writer.release()
+        with open(path, "rb") as f:
+            stream = io.BytesIO(f.read())
+    try:
+        cap = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+    except (cv2.error, SystemError, TypeError):
+        return False
+    ok = cap.isOpened() and cap.read()[0]
+    cap.release()
+    return bool(ok)
 
-# ---- prediction from bytes ----
-def predict_from_bytes(video_bytes, model, actions, seq_len=60, flip_try=True):
-    buf = np.frombuffer(video_bytes, dtype=np.uint8)
-
-    # Write to a temp file (must close before cv2.VideoCapture)
-    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-        tmp.write(buf)
-        tmp.flush()
-        path = tmp.name
-
-    def process(path, do_flip=False):
-        seq = []
-        cap = cv2.VideoCapture(path)
-        with mp_holistic.Holistic(
-            static_image_mode=False,  # use video mode
-            model_complexity=1,
-            smooth_landmarks=True,
-            refine_face_landmarks=False
-        ) as hol:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                if do_flip:
-                    frame = cv2.flip(frame, 1)
+STREAM_DECODE = _probe_stream_decoding()
 
-                image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                image.flags.writeable = False
-                results = hol.process(image)
+@contextmanager
+def open_video(video_bytes):
+    """cv2.VideoCapture over the uploaded bytes, without touching disk.
 
-                key = extract_keypoints(results)
-                seq.append(key)
-                if len(seq) >= seq_len:
-                    break
+    OpenCV >= 4.11 decodes straight from an io.BufferedIOBase (FFmpeg backend only);
+    older builds get a spool file in VIDEO_SPOOL_DIR, which defaults to tmpfs. Which
+    one is decided once at import (STREAM_DECODE), so a corrupt upload is probed once
+    and never copied to the spool. The capture does not own the stream, so it must
+    stay referenced until release().
+    """
+    stream = spool = None
+    if STREAM_DECODE:
+        stream = io.BytesIO(video_bytes)
+        cap = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False, dir=VIDEO_SPOOL_DIR) as tmp:
+            tmp.write(video_bytes)
+            spool = tmp.name
+        cap = cv2.VideoCapture(spool)
+    try:
+        yield cap
+    finally:
         cap.release()
+        if stream:
+            stream.close()
+        if spool:
+            os.remove(spool)
+
+# ---- frame selection ----
+# "uniform": seq_len frames spread over the whole clip, as in training; "first": the first seq_len frames
+FRAME_SAMPLING = os.getenv("FRAME_SAMPLING", "uniform")
+LANDMARK_MAX_SIDE = int(os.getenv("LANDMARK_MAX_SIDE", "0"))  # longest side fed to Holistic, 0 = as decoded
+MOTION_GATE = float(os.getenv("MOTION_GATE", "0"))  # mean abs grey diff (0-255) below which a frame is static, 0 = off
+
+def select_frames(cap, seq_len, sampling=None):
+    """Yields the decoded frames to landmark, at most seq_len of them.
+
+    "uniform" reads the frame count up front and only decodes the frames picked by
+    sample_indices; the ones in between are skipped with grab(), which never
+    converts them. Containers without a frame count fall back to "first".
+    """
+    sampling = sampling or FRAME_SAMPLING
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if sampling == "uniform" else 0
+    if n <= 0:
+        for _ in range(seq_len):
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield frame
+        return
+
+    # short clips repeat their last frame; the caller pads, so each index is read once
+    pos = 0
+    for idx in sorted(set(sample_indices(n, seq_len))):
+        while pos < idx:
+            if not cap.grab():
+                return
+            pos += 1
+        ret, frame = cap.read()
+        if not ret:
+            return
+        pos += 1
+        yield frame
+
+def downscale(frame, max_side):
+    h, w = frame.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return frame
+    s = max_side / max(h, w)
+    return cv2.resize(frame, (round(w * s), round(h * s)), interpolation=cv2.INTER_AREA)
+
+class MotionGate:
+    """Flags frames that barely differ from the last landmarked one, so their keypoints
+    can be repeated instead of running Holistic again."""
+
+    def __init__(self, threshold=MOTION_GATE, thumb=(64, 64)):
+        self.threshold = threshold
+        self.thumb = thumb
+        self._prev = None
+
+    def is_static(self, frame):
+        if not self.threshold:
+            return False
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.thumb, interpolation=cv2.INTER_AREA)
+        if self._prev is not None and cv2.absdiff(small, self._prev).mean() < self.threshold:
+            return True
+        self._prev = small
+        return False
+
+# ---- landmarking profiles ----
+# "accurate":  the settings the model was trained with
+# "fast":      lightest pose model; a lower tracking threshold keeps Holistic tracking
+#              from frame to frame instead of falling back to full-frame detection
+#              (MediaPipe downloads the lite pose model on first use)
+# "fast-crop": "fast" on the signing space around the previous frame's arms (HandCrop)
+LANDMARK_PROFILES = {
+    "accurate":  {"model_complexity": 1, "min_tracking_confidence": 0.5, "hand_crop": False},
+    "fast":      {"model_complexity": 0, "min_tracking_confidence": 0.3, "hand_crop": False},
+    "fast-crop": {"model_complexity": 0, "min_tracking_confidence": 0.3, "hand_crop": True},
+}
+LANDMARK_PROFILE = os.getenv("LANDMARK_PROFILE", "accurate")
+if LANDMARK_PROFILE not in LANDMARK_PROFILES:
+    raise ValueError(f"unknown LANDMARK_PROFILE {LANDMARK_PROFILE!r}, expected one of {', '.join(LANDMARK_PROFILES)}")
+HAND_CROP = LANDMARK_PROFILES[LANDMARK_PROFILE]["hand_crop"]
 
-        if not seq:
+# nose, shoulders, elbows, wrists: what the signing space is cropped around
+CROP_POSE_POINTS = [0, 11, 12, 13, 14, 15, 16]
+
+class HandCrop:
+    """Crops frames to the box around the previous frame's arms, face and hands plus a
+    margin, so Holistic works on fewer pixels with the hands larger in them. The crop
+    only moves once a tracked point gets within `inset` of its edge, which keeps the
+    input stable for Holistic's tracking. Frames after a frame without pose are not cropped."""
+
+    def __init__(self, margin=0.25, min_side=0.4, inset=0.1):
+        self.margin = margin
+        self.min_side = min_side
+        self.inset = inset
+        self.roi = None  # (x0, y0, w, h), normalized frame coordinates
+
+    def _points(self, buf):
+        i = len(buf) - 1
+        if i < 0 or not buf.has_pose[i]:
             return None
+        pts = [buf.pose[i, CROP_POSE_POINTS, :2]]
+        pts += [hand[i, :, :2] for hand, has in ((buf.lh, buf.has_lh), (buf.rh, buf.has_rh)) if has[i]]
+        return np.concatenate(pts, axis=0)
 
-        if len(seq) < seq_len:
-            seq.extend([seq[-1]] * (seq_len - len(seq)))
+    def _inside(self, pts):
+        x0, y0, w, h = self.roi
+        lo = np.array([x0 + self.inset * w, y0 + self.inset * h])
+        hi = np.array([x0 + (1 - self.inset) * w, y0 + (1 - self.inset) * h])
+        return bool(((pts >= lo) & (pts <= hi)).all())
 
-        X = np.expand_dims(np.array(seq[:seq_len], dtype=np.float32), axis=0)
-        print("size of X:", X.shape)
-        return model.predict(X, verbose=0)[0]
+    def crop(self, frame, buf):
+        """(cropped frame, roi) for the next frame of buf; roi is None for the full frame."""
+        pts = self._points(buf)
+        if pts is None:
+            self.roi = None
+            return frame, None
+        if self.roi is None or not self._inside(pts):
+            lo, hi = pts.min(axis=0), pts.max(axis=0)
+            side = np.maximum((hi - lo) * (1 + 2 * self.margin), self.min_side)
+            lo = np.clip((lo + hi - side) / 2, 0.0, 1.0)
+            hi = np.clip(lo + side, 0.0, 1.0)
+            self.roi = (lo[0], lo[1], hi[0] - lo[0], hi[1] - lo[1])
 
-    p1 = process(path, do_flip=False)
-    p2 = process(path, do_flip=True) if flip_try else None
+        H, W = frame.shape[:2]
+        x0, y0, w, h = self.roi
+        px0, py0 = int(x0 * W), int(y0 * H)
+        px1, py1 = max(px0 + 1, int(np.ceil((x0 + w) * W))), max(py0 + 1, int(np.ceil((y0 + h) * H)))
+        return frame[py0:py1, px0:px1], (px0 / W, py0 / H, (px1 - px0) / W, (py1 - py0) / H)
 
-    os.remove(path)  # cleanup
+# ---- Holistic graph pool ----
+# reflip checks out two graphs per request (one for the flipped frames), so the pool
+# holds two per concurrent request and never fewer than one request needs
+GRAPHS_PER_REQUEST = 2 if FLIP_MODE == "reflip" else 1
+HOLISTIC_POOL_SIZE = max(int(os.getenv("HOLISTIC_POOL_SIZE", str(min(4, os.cpu_count() or 1) * GRAPHS_PER_REQUEST))),
+                         GRAPHS_PER_REQUEST)
+HOLISTIC_CHECKOUT_TIMEOUT_S = float(os.getenv("HOLISTIC_CHECKOUT_TIMEOUT_S", "30"))  # then 503
 
-    if p1 is None and p2 is None:
-        return "Too short", 0.0, None
+def _holistic(profile=None):
+    import mediapipe as mp  # deferred to startup (see Startup)
+    settings = LANDMARK_PROFILES[profile or LANDMARK_PROFILE]
+    return mp.solutions.holistic.Holistic(
+        static_image_mode=False,  # use video mode
+        model_complexity=settings["model_complexity"],
+        smooth_landmarks=True,
+        refine_face_landmarks=False,
+        min_tracking_confidence=settings["min_tracking_confidence"],
+    )
+
+def _percentiles_ms(samples):
+    ms = np.array(samples, dtype=np.float64) * 1000.0
+    if not ms.size:
+        return None
+    return {"p50": float(np.percentile(ms, 50)), "p99": float(np.percentile(ms, 99)), "max": float(ms.max())}
+
+class PoolTimeout(RuntimeError):
+    """No Holistic graph came free within the checkout timeout (reported as 503)."""
+
+class HolisticPool:
+    """Bounded, thread-safe pool of pre-initialized Holistic graphs.
+
+    Requests check graphs out for the duration of one video; on return a graph is
+    reset() so no tracking state carries over to the next video. A checkout that
+    waits longer than timeout seconds raises PoolTimeout.
+    """
+
+    def __init__(self, size=HOLISTIC_POOL_SIZE, factory=_holistic, window=1024,
+                 timeout=HOLISTIC_CHECKOUT_TIMEOUT_S):
+        self.size = size
+        self.timeout = timeout
+        self._factory = factory
+        self._free = [factory() for _ in range(size)]
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=window)  # seconds spent waiting for a free graph
+        self._checkouts = 0
+        self._timeouts = 0
+        self._peak = 0
+
+    @contextmanager
+    def checkout(self, n=1):
+        # asking for more graphs than the pool holds (reflip on a 1-graph pool) takes
+        # the whole pool plus temporary graphs that are closed afterwards
+        pooled = min(n, self.size)
+        t0 = time.perf_counter()
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._free) >= pooled, timeout=self.timeout):
+                self._timeouts += 1
+                raise PoolTimeout(f"no Holistic graph free after {self.timeout:.0f} s")
+            hols = [self._free.pop() for _ in range(pooled)]
+            self._waits.append(time.perf_counter() - t0)
+            self._checkouts += 1
+            self._peak = max(self._peak, self.size - len(self._free))
+        extra = []
+        try:
+            for _ in range(n - pooled):
+                extra.append(self._factory())
+            yield hols + extra
+        finally:
+            for hol in extra:
+                hol.close()
+            for i, hol in enumerate(hols):
+                try:
+                    hol.reset()
+                except Exception:
+                    try:
+                        hols[i] = self._factory()
+                    except Exception:
+                        continue  # keep the old graph rather than shrink the pool
+                    hol.close()
+            with self._cond:
+                self._free.extend(hols)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            in_use = self.size - len(self._free)
+            return {
+                "size": self.size,
+                "in_use": in_use,
+                "occupancy": in_use / self.size if self.size else 0.0,
+                "peak_in_use": self._peak,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_ms": _percentiles_ms(self._waits),
+            }
+
+# ---- content-addressed result cache ----
+# retries and re-uploads of the same recording skip decode, Holistic and the LSTM
+CACHE_MEM_MB = float(os.getenv("CACHE_MEM_MB", "64"))  # 0 disables the cache
+CACHE_DIR = os.getenv("CACHE_DIR")  # optional on-disk tier
+
+def cache_key(video_bytes, **settings):
+    """Hash of the clip plus every setting that changes its sequences or probabilities."""
+    h = hashlib.blake2b(video_bytes, digest_size=20)
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+class PredictionCache:
+    """Two-tier cache of {"seq", "fseq", "probs"} arrays keyed by cache_key().
+
+    The memory tier is an LRU bounded by the bytes of the arrays it holds; the
+    optional disk tier keeps one .npz per key and promotes hits back to memory.
+    """
 
-    probs = p1 if (p2 is None or p1.max() >= p2.max()) else p2
+    def __init__(self, max_bytes=int(CACHE_MEM_MB * 1024 * 1024), disk_dir=CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._lru = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".npz")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+                self._hits["memory"] += 1
+                return entry
+        if self.disk_dir and os.path.exists(self._path(key)):
+            try:
+                with np.load(self._path(key)) as f:
+                    entry = {k: f[k] for k in f.files}
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                with self._lock:
+                    self._hits["disk"] += 1
+                return entry
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key, entry):
+        entry = {k: np.asarray(v) for k, v in entry.items() if v is not None}
+        self._remember(key, entry)
+        if self.disk_dir:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, **entry)
+            os.replace(tmp, path)  # readers never see a partial file
+
+    def _remember(self, key, entry):
+        size = sum(v.nbytes for v in entry.values())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old is not None:
+                self._bytes -= sum(v.nbytes for v in old.values())
+            self._lru[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._lru.popitem(last=False)
+                self._bytes -= sum(v.nbytes for v in evicted.values())
+
+    def stats(self):
+        with self._lock:
+            hits = sum(self._hits.values())
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._lru),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir,
+                "hits_memory": self._hits["memory"],
+                "hits_disk": self._hits["disk"],
+                "misses": self._misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+            }
+
+# ---- prediction from bytes ----
+def _sequence(buf, seq_len, mirror=False):
+    # clips shorter than seq_len are padded by repeating the last frame
+    X = np.empty((seq_len, FEATURE_DIM), dtype=np.float32)
+    buf.keypoints(mirror=mirror, out=X[:len(buf)])
+    X[len(buf):] = X[len(buf) - 1]
+    return X
+
+def _landmark_frames(frames, hols, buf, fbuf=None, max_side=0, gate=None, on_full=None, crop=None,
+                     upload=None):
+    """Runs Holistic over frames into buf (and the cv2.flip'ed frames into fbuf).
+    on_full is called when buf has no room left; without it the loop stops.
+    With a HandCrop, Holistic only sees the crop around the previous frame's arms.
+    Time the decoder spends waiting on upload (an UploadStream) is left out of "decode"."""
+    hol, hol_flip = hols[0], hols[-1]
+    frames = iter(frames)
+    while True:
+        t0, waited = time.perf_counter(), upload.waited if upload is not None else 0.0
+        frame = next(frames, None)
+        if upload is not None:
+            waited = upload.waited - waited
+        metrics.observe_stage("decode", time.perf_counter() - t0 - waited)
+        if frame is None:
+            break
+        if len(buf) >= buf.capacity:
+            if on_full is None:
+                break
+            on_full()
+        with metrics.stage("downscale"):
+            frame = downscale(frame, max_side)
+        if len(buf) and gate is not None and gate.threshold:
+            with metrics.stage("gate"):
+                static = gate.is_static(frame)
+            if static:
+                buf.repeat_last()
+                if fbuf is not None:
+                    fbuf.repeat_last()
+                continue
+
+        roi = None
+        if crop is not None:
+            with metrics.stage("crop"):
+                frame, roi = crop.crop(frame, buf)
+
+        with metrics.stage("color"):
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+        with metrics.stage("holistic"):
+            results = hol.process(image)
+        with metrics.stage("keypoints"):
+            buf.append(results, roi)
+
+        if fbuf is not None:
+            with metrics.stage("color"):
+                flipped = cv2.flip(image, 1)
+                flipped.flags.writeable = False
+            froi = (1.0 - roi[0] - roi[2], roi[1], roi[2], roi[3]) if roi else None
+            with metrics.stage("holistic"):
+                fresults = hol_flip.process(flipped)
+            with metrics.stage("keypoints"):
+                fbuf.append(fresults, froi)
+
+def _sequences(buf, fbuf, seq_len, flip_mode):
+    if not len(buf):
+        return None, None
+
+    seq = _sequence(buf, seq_len)
+    if flip_mode == "mirror":
+        return seq, _sequence(buf, seq_len, mirror=True)
+    if flip_mode == "reflip":
+        return seq, _sequence(fbuf, seq_len)
+    return seq, None
+
+def video_to_sequences(video_bytes, seq_len=60, flip_mode=None, pool=None,
+                       sampling=None, max_side=None, motion_gate=None, hand_crop=None):
+    """Returns (seq, flipped_seq) for the seq_len frames chosen by select_frames.
+
+    Every frame is decoded once and shared by both passes: flip_mode "mirror"
+    derives the flipped keypoints from the same Holistic results, "reflip" runs a
+    second Holistic graph on the cv2.flip'ed frame. flipped_seq is None otherwise.
+    Graphs come from pool (the service-wide holistic_pool by default); frames are
+    downscaled to max_side, near-duplicates skipped per motion_gate and, with
+    hand_crop (default: the profile's), cropped to the signing space.
+    """
+    pool = pool or holistic_pool
+    max_side = LANDMARK_MAX_SIDE if max_side is None else max_side
+    gate = MotionGate(MOTION_GATE if motion_gate is None else motion_gate)
+    crop = HandCrop() if (HAND_CROP if hand_crop is None else hand_crop) else None
+    buf = KeypointBuffer(seq_len)
+    fbuf = KeypointBuffer(seq_len) if flip_mode == "reflip" else None
+    with ExitStack() as stack:
+        with metrics.stage("open"):
+            cap = stack.enter_context(open_video(video_bytes))
+        hols = stack.enter_context(pool.checkout(2 if flip_mode == "reflip" else 1))
+        _landmark_frames(select_frames(cap, seq_len, sampling), hols, buf, fbuf, max_side, gate, crop=crop)
+
+    with metrics.stage("normalize"):
+        return _sequences(buf, fbuf, seq_len, flip_mode)
+
+def label_probs(probs, actions):
     idx = int(np.argmax(probs))
     pred_word = actions[idx]
     conf = float(probs[idx])
@@ -116,29 +507,577 @@ def predict_from_bytes(video_bytes, model, actions, seq_len=60, flip_try=True):
 
     return pred_word, conf, probs
 
+def predict_sequences(seqs, model, actions):
+    """Scores a clip's (seq_len, 258) sequence and its flipped variant in a single
+    batch and keeps the more confident one. Returns (word, confidence, probs)."""
+    seqs = [s for s in seqs if s is not None]
+    if not seqs:
+        return "Too short", 0.0, None
+
+    X = np.stack(seqs, axis=0)
+    print("size of X:", X.shape)
+    with metrics.stage("predict"):
+        P = model.predict(X, verbose=0)
+
+    probs = P[int(np.argmax(P.max(axis=1)))]
+    return label_probs(probs, actions)
+
+def predict_from_bytes(video_bytes, model, actions, seq_len=60, flip_try=True, flip_mode=None,
+                       cache=None, model_version=None):
+    flip_mode = (flip_mode or FLIP_MODE) if flip_try else None
+    key = None
+    if cache is not None:
+        key = cache_key(video_bytes, seq_len=seq_len, flip=flip_mode, model=model_version,
+                        sampling=FRAME_SAMPLING, max_side=LANDMARK_MAX_SIDE, motion_gate=MOTION_GATE,
+                        profile=LANDMARK_PROFILE)
+        hit = cache.get(key)
+        if hit is not None:
+            return label_probs(hit["probs"], actions)
+
+    seq, fseq = video_to_sequences(video_bytes, seq_len, flip_mode)
+    pred_word, conf, probs = predict_sequences((seq, fseq), model, actions)
+    if key is not None and probs is not None:
+        cache.put(key, {"seq": seq, "fseq": fseq, "probs": probs})
+    return pred_word, conf, probs
+
+# ---- streaming uploads ----
+# /predict/stream landmarks frames while the upload is still arriving
+STREAM_CHUNK = 64 * 1024
+STREAM_MAX_FRAMES = int(os.getenv("STREAM_MAX_FRAMES", "900"))  # rolling keypoint buffer
+STREAM_FRAME_STRIDE = int(os.getenv("STREAM_FRAME_STRIDE", "1"))  # landmark every n-th frame
+# a stream holds its graphs while it waits for the uploader's bytes, so streams get
+# their own pool and slow uploads never starve /predict and /predict/continuous
+STREAM_POOL_SIZE = int(os.getenv("STREAM_POOL_SIZE", str(GRAPHS_PER_REQUEST)))  # 0 turns /predict/stream off
+STREAM_MAX_CONCURRENT = int(os.getenv("STREAM_MAX_CONCURRENT", "8"))  # uploads in flight, then 503
+
+class UploadStream(io.BufferedIOBase):
+    """In-memory file that is still being written: reads block until the uploader
+    has appended enough bytes or finished, so cv2.VideoCapture can decode while the
+    body arrives. Streamable containers (WebM, fragmented MP4) decode progressively;
+    an MP4 whose index sits at the end makes FFmpeg seek there, which waits for the
+    whole upload, as before. FFmpeg asks for the file size when it opens the stream,
+    so without a known size (chunked uploads) nothing decodes until the end.
+    waited is the time readers have spent blocked on the uploader, in seconds."""
+
+    def __init__(self, size=None):
+        super().__init__()
+        self._size = size
+        self._buf = bytearray()
+        self._pos = 0
+        self._done = False
+        self._cond = threading.Condition()
+        self.waited = 0.0
+
+    def _wait_for(self, predicate):
+        # with self._cond held
+        if not predicate():
+            t0 = time.perf_counter()
+            self._cond.wait_for(predicate)
+            self.waited += time.perf_counter() - t0
+
+    def feed(self, chunk):
+        with self._cond:
+            self._buf += chunk
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self._done = True
+            self._cond.notify_all()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        with self._cond:
+            if size is None or size < 0:
+                self._wait_for(lambda: self._done)
+                size = len(self._buf) - self._pos
+            else:
+                self._wait_for(lambda: self._done or len(self._buf) >= self._pos + size)
+            data = bytes(self._buf[self._pos:self._pos + size])
+            self._pos += len(data)
+            return data
+
+    read1 = read
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        with self._cond:
+            if whence == io.SEEK_END:
+                if self._size is None:
+                    self._wait_for(lambda: self._done)
+                base = len(self._buf) if self._done else self._size
+            else:
+                base = self._pos if whence == io.SEEK_CUR else 0
+            self._pos = max(base + offset, 0)
+            return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def getvalue(self):
+        with self._cond:
+            return bytes(self._buf)
+
+def _strided_frames(cap, stride):
+    i = 0
+    while True:
+        if i % stride == 0:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield frame
+        elif not cap.grab():
+            return
+        i += 1
+
+def stream_to_sequences(stream, seq_len=60, flip_mode=None, pool=None,
+                        max_frames=STREAM_MAX_FRAMES, stride=STREAM_FRAME_STRIDE):
+    """Like video_to_sequences, but for an UploadStream: every stride-th frame is
+    landmarked as soon as it is decoded, since the clip length is not known up front.
+    The keypoints of the most recent max_frames frames are kept and seq_len of them
+    are picked with sample_indices once the upload ends (as in training). Graphs come
+    from stream_pool by default."""
+    pool = pool or stream_pool
+    buf = KeypointBuffer(max_frames)
+    fbuf = KeypointBuffer(max_frames) if flip_mode == "reflip" else None
+
+    def roll():
+        for b in (buf, fbuf):
+            if b is not None:
+                b.drop_oldest(max_frames // 2)
+
+    cap = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+    try:
+        with pool.checkout(2 if flip_mode == "reflip" else 1) as hols:
+            _landmark_frames(_strided_frames(cap, max(stride, 1)), hols, buf, fbuf,
+                             LANDMARK_MAX_SIDE, MotionGate(), on_full=roll,
+                             crop=HandCrop() if HAND_CROP else None, upload=stream)
+    finally:
+        cap.release()
+        metrics.observe_stage("upload_wait", stream.waited)
+
+    if not len(buf):
+        return None, None
+    idx = sample_indices(len(buf), seq_len)
+    seq = buf.keypoints()[idx]
+    if flip_mode == "mirror":
+        return seq, buf.keypoints(mirror=True)[idx]
+    if flip_mode == "reflip":
+        return seq, fbuf.keypoints()[idx]
+    return seq, None
+
+# ---- continuous recognition ----
+# /predict/continuous slides a window over the whole clip and reports every sign in it
+CONTINUOUS_WINDOW = int(os.getenv("CONTINUOUS_WINDOW", "60"))  # landmarked frames per window
+CONTINUOUS_STRIDE = int(os.getenv("CONTINUOUS_STRIDE", "10"))  # frames between window starts
+CONTINUOUS_FRAME_STRIDE = int(os.getenv("CONTINUOUS_FRAME_STRIDE", "1"))  # landmark every n-th frame
+CONTINUOUS_MAX_FRAMES = int(os.getenv("CONTINUOUS_MAX_FRAMES", "3000"))
+CONTINUOUS_BATCH = int(os.getenv("CONTINUOUS_BATCH", "64"))  # windows per model call
+SEGMENT_MAX_OVERLAP = float(os.getenv("SEGMENT_MAX_OVERLAP", "0.5"))  # of the shorter segment
+
+def video_to_keypoints(video_bytes, flip_mode=None, pool=None, max_frames=CONTINUOUS_MAX_FRAMES,
+                       stride=CONTINUOUS_FRAME_STRIDE):
+    """(T, 258) keypoints of every stride-th frame of the clip (up to max_frames) and
+    those of the flipped clip (None without flip_mode). Each frame is landmarked once."""
+    pool = pool or holistic_pool
+    buf = KeypointBuffer(max_frames)
+    fbuf = KeypointBuffer(max_frames) if flip_mode == "reflip" else None
+    with open_video(video_bytes) as cap, pool.checkout(2 if flip_mode == "reflip" else 1) as hols:
+        _landmark_frames(_strided_frames(cap, max(stride, 1)), hols, buf, fbuf,
+                         LANDMARK_MAX_SIDE, MotionGate(), crop=HandCrop() if HAND_CROP else None)
+
+    if not len(buf):
+        return None, None
+    if flip_mode == "mirror":
+        return buf.keypoints(), buf.keypoints(mirror=True)
+    if flip_mode == "reflip":
+        return buf.keypoints(), fbuf.keypoints()
+    return buf.keypoints(), None
+
+def window_starts(n, window, stride):
+    """Window start frames over n frames; the last window is aligned with the end of
+    the clip so the tail is always covered. A clip shorter than window is one window."""
+    if n <= window:
+        return [0]
+    starts = list(range(0, n - window + 1, stride))
+    if starts[-1] != n - window:
+        starts.append(n - window)
+    return starts
+
+def _windows(K, starts, window, seq_len):
+    # (len(starts), seq_len, 258) gathered from the shared keypoints, each window
+    # resampled to seq_len like a training clip
+    idx = np.asarray(sample_indices(min(window, len(K)), seq_len))
+    return K[np.asarray(starts)[:, None] + idx[None, :]]
+
+def score_windows(K, fK, model, starts, window, seq_len=60, batch=CONTINUOUS_BATCH):
+    """Probabilities per window, batch windows (plus their flipped twins) per model
+    call; of a window and its twin the more confident row is kept, as in predict_sequences."""
+    P = []
+    for i in range(0, len(starts), batch):
+        chunk = starts[i:i + batch]
+        X = _windows(K, chunk, window, seq_len)
+        if fK is not None:
+            X = np.concatenate([X, _windows(fK, chunk, window, seq_len)], axis=0)
+        with metrics.stage("predict"):
+            p = model.predict(X, verbose=0)
+        if fK is not None:
+            p, fp = p[:len(chunk)], p[len(chunk):]
+            p = np.where((p.max(axis=1) >= fp.max(axis=1))[:, None], p, fp)
+        P.append(p)
+    return np.concatenate(P, axis=0)
+
+def merge_segments(starts, P, actions, window, n, max_overlap=SEGMENT_MAX_OVERLAP):
+    """Window predictions -> [(word, confidence, start, end)] with inclusive frame
+    bounds. Consecutive windows with the same word are merged into one segment;
+    of segments overlapping by more than max_overlap of the shorter one, only the
+    more confident is kept."""
+    segments = []
+    for s, probs in zip(starts, P):
+        word, conf, _ = label_probs(probs, actions)
+        end = min(s + window, n) - 1
+        if word == "unknown":
+            continue
+        if segments and segments[-1][0] == word and s <= segments[-1][3] + 1:
+            w, c, s0, _ = segments[-1]
+            segments[-1] = (w, max(c, conf), s0, end)
+        else:
+            segments.append((word, conf, s, end))
+
+    kept = []
+    for seg in sorted(segments, key=lambda seg: -seg[1]):
+        _, _, s, e = seg
+        if all(min(e, ke) - max(s, ks) + 1 <= max_overlap * min(e - s + 1, ke - ks + 1)
+               for _, _, ks, ke in kept):
+            kept.append(seg)
+    return sorted(kept, key=lambda seg: seg[2])
+
+def predict_continuous(video_bytes, model, actions, seq_len=60, window=CONTINUOUS_WINDOW,
+                       stride=CONTINUOUS_STRIDE, flip_mode=None, frame_stride=CONTINUOUS_FRAME_STRIDE):
+    """Every sign in the clip as [(word, confidence, start_frame, end_frame)], frames
+    counted in the decoded video."""
+    flip_mode = flip_mode or FLIP_MODE
+    K, fK = video_to_keypoints(video_bytes, flip_mode, stride=frame_stride)
+    if K is None:
+        return []
+    starts = window_starts(len(K), window, stride)
+    P = score_windows(K, fK, model, starts, window, seq_len)
+    step = max(frame_stride, 1)
+    return [(word, conf, s * step, e * step)
+            for word, conf, s, e in merge_segments(starts, P, actions, window, len(K))]
+
+# ---- landmark uploads ----
+# /predict/keypoints: the client ran MediaPipe itself and sends a landmark payload
+# (keypoints.decode_landmarks), so only normalization and the LSTM run here
+KEYPOINT_MAX_FRAMES = int(os.getenv("KEYPOINT_MAX_FRAMES", "900"))
+
+def landmarks_to_sequences(raw, seq_len=60, flip_mode=None):
+    """(seq, flipped_seq) from (T, 258) raw landmark rows, sampled as in training.
+    Without frames there is nothing to re-run, so any flip_mode mirrors."""
+    buf = KeypointBuffer.from_raw(raw)
+    idx = sample_indices(len(buf), seq_len)
+    seq = buf.keypoints()[idx]
+    return seq, (buf.keypoints(mirror=True)[idx] if flip_mode else None)
+
+def predict_landmarks(payload):
+    """/predict/keypoints response body; ValueError for a malformed payload."""
+    raw = decode_landmarks(payload, max_frames=KEYPOINT_MAX_FRAMES)
+    pred_word, prob, _ = predict_sequences(landmarks_to_sequences(raw, 60, FLIP_MODE), batcher or model, actions)
+    return prediction_result(pred_word, prob)
+
+# ---- dynamic micro-batching ----
+# sequences from concurrent requests are scored together; BATCH_MAX_SIZE=1 disables it
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+BATCH_RESULT_TIMEOUT_S = float(os.getenv("BATCH_RESULT_TIMEOUT_S", "60"))  # a caller gives up after this
+
+class MicroBatcher:
+    """Queues (n, 60, 258) inputs from concurrent callers and flushes them as one
+    model.predict batch once max_batch sequences are waiting or the oldest one has
+    waited max_wait_ms. Has the same predict(X, verbose=0) signature as the model,
+    so it can be passed to predict_from_bytes in its place. A batch that fails fails
+    each of its callers; a caller whose batch never completes gets a TimeoutError."""
+
+    def __init__(self, model, max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, window=1024,
+                 result_timeout=BATCH_RESULT_TIMEOUT_S):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.result_timeout = result_timeout
+        self._q = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._sizes = Counter()
+        self._delays = deque(maxlen=window)  # seconds between submit and flush
+        threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+
+    def predict(self, X, verbose=0):
+        X = np.asarray(X, dtype=np.float32)
+        fut = Future()
+        self._q.put((X, time.perf_counter(), fut))
+        return fut.result(timeout=self.result_timeout)
+
+    def _run(self):
+        while True:
+            pending = [self._q.get()]
+            n = len(pending[0][0])
+            deadline = pending[0][1] + self.max_wait
+            while n < self.max_batch:
+                # past the deadline, still take whatever is already queued
+                timeout = max(deadline - time.perf_counter(), 0)
+                try:
+                    item = self._q.get(timeout=timeout) if timeout else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                pending.append(item)
+                n += len(item[0])
+            try:
+                self._flush(pending)
+            except Exception as e:  # assembling or splitting the batch: fail it, keep serving
+                for _, _, fut in pending:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _flush(self, pending):
+        now = time.perf_counter()
+        X = np.concatenate([x for x, _, _ in pending], axis=0)
+        P = self.model.predict(X, verbose=0)
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(X)
+            self._sizes[len(X)] += 1
+            self._delays.extend(now - t for _, t, _ in pending)
+
+        start = 0
+        for x, _, fut in pending:
+            fut.set_result(P[start:start + len(x)])
+            start += len(x)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._q.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "batch_size_hist": {str(k): v for k, v in sorted(self._sizes.items())},
+                "queue_delay_ms": _percentiles_ms(self._delays),
+            }
+
 # ---- Flask app ----
 app = Flask(__name__)
-model = load_model("Model - 93.32% Training Acc - 94.16% Testing Acc.h5")
+metrics.instrument(app)
+MODEL_PATH = os.getenv("MODEL_PATH", "Model - 93.32% Training Acc - 94.16% Testing Acc.h5")
+# keras | compiled | tflite-fp32 | tflite-float16 | tflite-dynamic | tflite-int8 (see engines.py)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "keras")
+ENGINE_DIR = os.getenv("ENGINE_DIR", "compiled_engines")
+TFLITE_THREADS = int(os.getenv("TFLITE_THREADS", "0")) or None
+WARMUP = os.getenv("WARMUP", "1") != "0"  # dummy inference before reporting ready
+model = batcher = holistic_pool = stream_pool = MODEL_VERSION = None  # set by Startup
+prediction_cache = PredictionCache() if CACHE_MEM_MB > 0 else None
+
+# ---- startup ----
+def _load_model():
+    global model, batcher, MODEL_VERSION
+    from engines import load_engine  # imports TensorFlow
+    model = load_engine(INFERENCE_ENGINE, MODEL_PATH, ENGINE_DIR, num_threads=TFLITE_THREADS)
+    with open(MODEL_PATH, "rb") as f:
+        version = os.getenv("MODEL_VERSION") or hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    MODEL_VERSION = f"{version}-{INFERENCE_ENGINE}"  # quantized engines give slightly different probs
+    batcher = MicroBatcher(model) if BATCH_MAX_SIZE > 1 else None
+
+def _load_holistic():
+    global holistic_pool, stream_pool
+    holistic_pool = HolisticPool()
+    stream_pool = HolisticPool(max(STREAM_POOL_SIZE, GRAPHS_PER_REQUEST)) if STREAM_POOL_SIZE > 0 else None
+
+def _warm_up():
+    # traces predict for the batch sizes of a single request (clip, clip + flip) and
+    # runs every pooled Holistic graph once, then resets it
+    for n in (1, 2):
+        (batcher or model).predict(np.zeros((n, 60, FEATURE_DIM), dtype=np.float32), verbose=0)
+    blank = np.zeros((256, 256, 3), dtype=np.uint8)
+    for pool in filter(None, (holistic_pool, stream_pool)):
+        with pool.checkout(pool.size) as hols:
+            for hol in hols:
+                hol.process(blank)
+
+class Startup:
+    """Cold start: TensorFlow + the model and MediaPipe + the Holistic pool load
+    concurrently, then _warm_up runs. ready is set only after that; phases holds
+    each phase's duration in ms, and error what stopped the sequence."""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.phases = {}
+        self.error = None
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        yield
+        self.phases[name] = round((time.perf_counter() - t0) * 1000.0, 1)
+        print(f"startup: {name} {self.phases[name]:.0f} ms")
+
+    def _timed(self, name, fn):
+        with self.phase(name):
+            fn()
+
+    def run(self):
+        try:
+            with self.phase("total"):
+                with ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup") as ex:
+                    jobs = [ex.submit(self._timed, "model", _load_model),
+                            ex.submit(self._timed, "holistic", _load_holistic)]
+                    for job in jobs:
+                        job.result()
+                if WARMUP:
+                    with self.phase("warmup"):
+                        _warm_up()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print("startup failed:", self.error)
+            raise
+        self.ready.set()
+
+startup = Startup()
+
+WORD_MAP = {
+    "0088":"قلب","0095":"حروق","0115":"صداع","0125":"تساقط الشعر","0131":"حكة / هرش",
+    "0157":"مناعة","0159":"معافى","0160":"يأكل","0161":"يشرب","0162":"ينام",
+    "0171":"يبني","0172":"يكسر","0173":"يمشي","0174":"يحب","0175":"يكره",
+    "0176":"يشوي","0177":"يحرث","0178":"يزرع","0184":"يدعم","0187":"يتنامى",
+    "0195":"أب","0196":"أم","0197":"أخت","0255":"تعب","0256":"بكاء","0260":"ثقيل",
+    "0287":"يسار","0288":"يمين","0289":"مرحبا","0293":"شكراً"
+}
+
+def prediction_result(pred_word, prob):
+    pred_word = WORD_MAP.get(pred_word, pred_word)
+    print("Predicted:", pred_word, "conf:", prob)
+    return {"text": pred_word, "confidence": prob}
+
+def predict_video(video_bytes):
+    """Whole-clip prediction as the /predict response body (also the job run by serve_workers.py)."""
+    pred_word, prob, _ = predict_from_bytes(video_bytes, batcher or model, actions,
+                                            cache=prediction_cache, model_version=MODEL_VERSION)
+    return prediction_result(pred_word, prob)
+
+def predict_continuous_video(video_bytes):
+    """/predict/continuous response body: the signs in order and the joined text."""
+    segments = [{"text": WORD_MAP.get(word, word), "confidence": conf,
+                 "start_frame": start, "end_frame": end}
+                for word, conf, start, end in predict_continuous(video_bytes, batcher or model, actions)]
+    print("Predicted:", [s["text"] for s in segments])
+    return {"text": " ".join(s["text"] for s in segments), "segments": segments}
+
+@app.before_request
+def _until_ready():
+    if request.endpoint not in ("ready", "metrics") and not startup.ready.is_set():
+        resp = jsonify({"error": "ML service is starting"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "1"
+        return resp
+
+@app.errorhandler(PoolTimeout)
+def _pool_timeout(e):
+    resp = jsonify({"error": str(e)})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """200 once the model and Holistic graphs are loaded and warm, 503 before."""
+    body = {"ready": startup.ready.is_set(), "phases": startup.phases, "error": startup.error}
+    return jsonify(body), 200 if body["ready"] else 503
 
 @app.route("/predict", methods=["POST"])
 def predict():
     video_bytes = request.files["video"].read()
     print(f"Received video: {len(video_bytes) / (1024*1024):.2f} MB")
+    return jsonify(predict_video(video_bytes))
 
-    pred_word, prob, _ = predict_from_bytes(video_bytes, model, actions)
+stream_workers = ThreadPoolExecutor(max_workers=STREAM_MAX_CONCURRENT, thread_name_prefix="stream")
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONCURRENT)
 
-    mapping = {
-        "0088":"قلب","0095":"حروق","0115":"صداع","0125":"تساقط الشعر","0131":"حكة / هرش",
-        "0157":"مناعة","0159":"معافى","0160":"يأكل","0161":"يشرب","0162":"ينام",
-        "0171":"يبني","0172":"يكسر","0173":"يمشي","0174":"يحب","0175":"يكره",
-        "0176":"يشوي","0177":"يحرث","0178":"يزرع","0184":"يدعم","0187":"يتنامى",
-        "0195":"أب","0196":"أم","0197":"أخت","0255":"تعب","0256":"بكاء","0260":"ثقيل",
-        "0287":"يسار","0288":"يمين","0289":"مرحبا","0293":"شكراً"
-    }
-    pred_word = mapping.get(pred_word, pred_word)
+def _landmark_stream(stream, request_id):
+    # runs on stream_workers; the stages go back to the request with the sequences
+    with metrics.collect_stages(request_id) as stages:
+        return stream_to_sequences(stream, 60, FLIP_MODE), stages
 
-    print("Predicted:", pred_word, "conf:", prob)
-    return jsonify({"text": pred_word, "confidence": prob})
+@app.route("/predict/stream", methods=["POST"])
+def predict_stream():
+    """Raw video body, plain or chunked; decoding starts with the first bytes.
+    Chunked senders should pass the total size in X-Video-Size (see UploadStream).
+    Past STREAM_MAX_CONCURRENT uploads, or when no stream graph comes free in time, 503."""
+    if stream_pool is None:
+        return jsonify({"error": "streaming uploads are turned off (STREAM_POOL_SIZE=0)"}), 404
+    if not stream_slots.acquire(blocking=False):
+        raise PoolTimeout("too many streaming uploads in progress")
+    try:
+        stream = UploadStream(size=request.content_length or request.headers.get("X-Video-Size", type=int))
+        landmarking = stream_workers.submit(_landmark_stream, stream, metrics.request_id())
+        received = 0
+        try:
+            while not (landmarking.done() and landmarking.exception()):  # stop reading once it failed
+                chunk = request.stream.read(STREAM_CHUNK)
+                if not chunk:
+                    break
+                stream.feed(chunk)
+                received += len(chunk)
+        finally:
+            stream.finish()
+        print(f"Streamed video: {received / (1024*1024):.2f} MB")
+        (seq, fseq), stages = landmarking.result()
+        metrics.add_stages(stages, observe=False)
+    finally:
+        stream_slots.release()
+    pred_word, prob, _ = predict_sequences((seq, fseq), batcher or model, actions)
+    return jsonify(prediction_result(pred_word, prob))
+
+@app.route("/predict/continuous", methods=["POST"])
+def predict_continuous_route():
+    video_bytes = request.files["video"].read()
+    print(f"Received video: {len(video_bytes) / (1024*1024):.2f} MB")
+    return jsonify(predict_continuous_video(video_bytes))
+
+@app.route("/predict/keypoints", methods=["POST"])
+def predict_keypoints():
+    payload = request.get_data()
+    print(f"Received landmarks: {len(payload) / 1024:.1f} KB")
+    try:
+        return jsonify(predict_landmarks(payload))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "batcher": batcher.stats() if batcher else None,
+        "holistic_pool": holistic_pool.stats(),
+        "stream_pool": stream_pool.stats() if stream_pool else None,
+        "cache": prediction_cache.stats() if prediction_cache else None,
+        "video_decode": "stream" if STREAM_DECODE else "spool",
+    })
 
 if __name__ == "__main__":
+    # serve /ready right away and load in the background; under the debug reloader
+    # only the child process that actually serves loads anything
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        threading.Thread(target=startup.run, name="startup", daemon=True).start()
     app.run(port=6000, debug=True)
+else:
+    startup.run()  # imported (serve_workers.py, offline scripts): warm before returning
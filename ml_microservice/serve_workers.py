@@ -0,0 +1,286 @@
+'''
+Multi-process serving mode for the ML service:
+
+    python serve_workers.py
+
+The front process only parses requests and never imports TensorFlow or
+MediaPipe. ML_WORKERS worker processes each import ml.py (their own model,
+Holistic graph and prediction cache), pinned to their own CPUs with
+WORKER_THREADS math threads, so landmarking and inference of different
+requests run in parallel instead of behind one GIL.
+
+Requests wait in a bounded admission queue (ADMISSION_QUEUE) in front of the
+workers. When it is full the request is rejected at once with 429, and while
+no worker is up (startup, respawn) with 503, both with a Retry-After estimated
+from the queue depth and recent service times. /stats reports the queue depth
+for autoscaling. A worker that dies or exceeds JOB_TIMEOUT_S fails its job
+with 500 and is respawned. Jobs carry the request's X-Request-ID, and the stage
+timings a worker records (decode, holistic, predict) come back with its result
+into the front's /metrics and slow-request log.
+'''
+import math, os, queue, threading, time
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import Future
+
+from flask import Flask, request, jsonify
+
+import metrics
+
+def _cpus():
+    return sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+
+ML_WORKERS = int(os.getenv("ML_WORKERS", str(len(_cpus()))))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "0")) or max(1, len(_cpus()) // ML_WORKERS)
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", str(2 * ML_WORKERS)))  # waiting requests, not counting running ones
+if ADMISSION_QUEUE < 1:  # queue.Queue(maxsize=0) would be unbounded, not "no waiting"
+    raise ValueError(f"ADMISSION_QUEUE must be at least 1, got {ADMISSION_QUEUE}")
+JOB_TIMEOUT_S = float(os.getenv("JOB_TIMEOUT_S", "120"))
+
+class WorkerDied(RuntimeError):
+    pass
+
+# ---- worker process ----
+def _worker_main(conn, cpus, threads):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    # one model, the Holistic graphs of one request (two under reflip, ml.py's default
+    # FLIP_MODE), no stream pool (the front sends whole clips) and no cross-request
+    # batching per process; parallelism comes from the processes
+    os.environ.update({
+        "OMP_NUM_THREADS": str(threads),
+        "TFLITE_THREADS": str(threads),
+        "HOLISTIC_POOL_SIZE": "2" if os.getenv("FLIP_MODE", "reflip") == "reflip" else "1",
+        "STREAM_POOL_SIZE": "0",
+        "BATCH_MAX_SIZE": "1",
+    })
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    import ml
+
+    conn.send(os.getpid())
+    while True:
+        try:
+            fn, args, request_id = conn.recv()
+        except EOFError:
+            break
+        with metrics.collect_stages(request_id) as stages:
+            try:
+                ok, value = True, getattr(ml, fn)(*args)
+            except ValueError as e:  # bad input, reported to the client as 400
+                ok, value = False, ValueError(str(e))
+            except Exception as e:
+                print(f"ML worker job {fn} failed (request {request_id}): {type(e).__name__}: {e}")
+                ok, value = False, RuntimeError(f"{type(e).__name__}: {e}")
+        conn.send((ok, value, stages))
+
+# ---- worker pool ----
+class WorkerPool:
+    """ML worker processes behind a bounded job queue. submit() never blocks: it
+    raises queue.Full when the admission queue is full. Each worker is fed by its
+    own dispatcher thread, which waits on the process and respawns it if it dies."""
+
+    def __init__(self, workers=ML_WORKERS, queue_size=ADMISSION_QUEUE, threads=WORKER_THREADS,
+                 timeout=JOB_TIMEOUT_S, window=1000):
+        self.workers = workers
+        self.threads = threads
+        self.timeout = timeout
+        self._ctx = mp.get_context("spawn")  # no forked TF/MediaPipe state
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._ready = set()
+        self._busy = 0
+        self._completed = self._failed = self._respawns = 0
+        self._service = deque(maxlen=window)
+        self._avg_service_s = None
+        cpus = _cpus()
+        for slot in range(workers):
+            pinned = [cpus[(slot * threads + i) % len(cpus)] for i in range(threads)]
+            threading.Thread(target=self._serve, args=(slot, pinned), daemon=True,
+                             name=f"ml-worker-{slot}").start()
+
+    def submit(self, fn, *args, request_id=None):
+        """Future of (result, [(stage, seconds), ...]) as recorded by the worker."""
+        fut = Future()
+        self._jobs.put_nowait((fut, fn, args, request_id))
+        return fut
+
+    @property
+    def ready(self):
+        return len(self._ready)
+
+    def queue_depth(self):
+        return self._jobs.qsize()
+
+    def retry_after(self):
+        """Seconds until a new request would likely get a worker."""
+        avg = self._avg_service_s or 1.0
+        return max(1, math.ceil((self.queue_depth() + 1) * avg / max(1, self.ready)))
+
+    def _spawn(self, slot, cpus):
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child, cpus, self.threads),
+                                 daemon=True, name=f"ml-worker-{slot}")
+        proc.start()
+        child.close()
+        while not parent.poll(1.0):  # model and Holistic load
+            if not proc.is_alive():
+                raise WorkerDied(f"worker {slot} exited during startup ({proc.exitcode})")
+        pid = parent.recv()
+        print(f"ML worker {slot} ready (pid {pid}, cpus {cpus})")
+        return proc, parent
+
+    def _call(self, proc, conn, fn, args, request_id):
+        conn.send((fn, args, request_id))
+        deadline = time.monotonic() + self.timeout
+        while not conn.poll(0.5):
+            if not proc.is_alive():
+                raise WorkerDied(f"worker exited ({proc.exitcode})")
+            if time.monotonic() > deadline:
+                raise WorkerDied(f"job timed out after {self.timeout:.0f} s")
+        ok, value, stages = conn.recv()
+        if not ok:
+            raise value
+        return value, stages
+
+    def _lost(self, slot, proc, conn, reason):
+        print(f"ML worker {slot} lost: {reason}; respawning")
+        with self._lock:
+            self._ready.discard(slot)
+            self._respawns += 1
+        proc.kill()
+        proc.join()
+        conn.close()
+
+    def _serve(self, slot, cpus):
+        proc = conn = job = None
+        while True:
+            if proc is None:
+                try:
+                    proc, conn = self._spawn(slot, cpus)
+                except (WorkerDied, EOFError, OSError) as e:
+                    print(f"ML worker {slot}: {e}; retrying")
+                    time.sleep(1.0)
+                    continue
+                with self._lock:
+                    self._ready.add(slot)
+
+            if job is None:
+                try:
+                    job = self._jobs.get(timeout=1.0)
+                except queue.Empty:
+                    pass
+            if not proc.is_alive():
+                # died while idle: respawn first, a job already taken runs on the new process
+                self._lost(slot, proc, conn, f"exited ({proc.exitcode})")
+                proc = conn = None
+                continue
+            if job is None:
+                continue
+
+            (fut, fn, args, request_id), job = job, None
+            if not fut.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._busy += 1
+            t0 = time.perf_counter()
+            try:
+                fut.set_result(self._call(proc, conn, fn, args, request_id))
+            except (WorkerDied, EOFError, OSError) as e:
+                reason = str(e) or type(e).__name__
+                fut.set_exception(WorkerDied(f"ML worker {slot} lost: {reason}"))
+                self._lost(slot, proc, conn, reason)
+                proc = conn = None
+            except Exception as e:
+                fut.set_exception(e)
+            dt = time.perf_counter() - t0
+            with self._lock:
+                self._busy -= 1
+                if fut.exception() is None:
+                    self._completed += 1
+                    self._service.append(dt)
+                    self._avg_service_s = dt if self._avg_service_s is None else 0.8 * self._avg_service_s + 0.2 * dt
+                else:
+                    self._failed += 1
+
+    def stats(self):
+        with self._lock:
+            times = sorted(self._service)
+            return {
+                "workers": self.workers,
+                "ready": len(self._ready),
+                "busy": self._busy,
+                "threads_per_worker": self.threads,
+                "queue_depth": self._jobs.qsize(),
+                "queue_capacity": self._jobs.maxsize,
+                "completed": self._completed,
+                "failed": self._failed,
+                "respawns": self._respawns,
+                "service_ms": {
+                    "p50": times[len(times) // 2] * 1000.0,
+                    "p99": times[min(len(times) - 1, int(len(times) * 0.99))] * 1000.0,
+                } if times else None,
+            }
+
+# ---- Flask app ----
+app = Flask(__name__)
+metrics.instrument(app)
+pool = None
+rejected = {"429": 0, "503": 0}
+
+def _reject(status, reason):
+    rejected[str(status)] += 1
+    resp = jsonify({"error": reason})
+    resp.status_code = status
+    resp.headers["Retry-After"] = str(pool.retry_after())
+    return resp
+
+def _run(fn, *args):
+    if pool.ready == 0:
+        return _reject(503, "no ML worker available yet")
+    try:
+        fut = pool.submit(fn, *args, request_id=metrics.request_id())
+    except queue.Full:
+        return _reject(429, "ML service is at capacity")
+    try:
+        result, stages = fut.result()
+        metrics.add_stages(stages)
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    video_bytes = request.files["video"].read()
+    print(f"Received video: {len(video_bytes) / (1024*1024):.2f} MB")
+    return _run("predict_video", video_bytes)
+
+@app.route("/predict/stream", methods=["POST"])
+def predict_stream():
+    # workers get whole clips: the body is read before the job is queued
+    return _run("predict_video", request.get_data())
+
+@app.route("/predict/continuous", methods=["POST"])
+def predict_continuous():
+    return _run("predict_continuous_video", request.files["video"].read())
+
+@app.route("/predict/keypoints", methods=["POST"])
+def predict_keypoints():
+    return _run("predict_landmarks", request.get_data())
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """200 once at least one worker is up (workers warm up before they report in)."""
+    body = {"ready": pool.ready > 0, "workers_ready": pool.ready, "workers": pool.workers}
+    return jsonify(body), 200 if body["ready"] else 503
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({"pool": pool.stats(), "rejected": dict(rejected)})
+
+if __name__ == "__main__":
+    pool = WorkerPool()
+    app.run(port=6000, threaded=True)